@@ -0,0 +1,80 @@
+"""Guard capi's startup time and keep heavy dependencies out of the fast paths.
+
+Usage:
+    python benchmarks/check_startup.py
+    python benchmarks/check_startup.py --repeat 20 --max-ms 150
+
+``capi --help`` is timed ``--repeat`` times (median, against a bare
+interpreter start for reference) and must stay under ``--max-ms``. Each
+command in CHECKS also runs once under ``-X importtime`` and must not import
+any of its forbidden modules. Exits with status 1 on any regression, so it
+can gate CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capi.utils.startup import parse_importtime  # noqa: E402
+
+# Only the commands that talk to an LLM or open a UI may pay for these
+HEAVY = ('openai', 'prompt_toolkit', 'tkinter', 'jsonpath_ng', 'dotenv')
+CHECKS = [
+    (['--help'], HEAVY + ('pyperclip', 'sqlite3')),
+    (['code', '--help'], HEAVY + ('pyperclip', 'sqlite3')),
+    (['code', '--str', '--out', os.devnull], HEAVY + ('pyperclip',)),
+    (['again', '--help'], HEAVY),
+]
+CHILD_CODE = "import sys; sys.argv[0] = 'capi'; from capi.cli import main; main()"
+
+def _run(argv, cwd):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+               CAPI_NO_DAEMON='1')
+    start = time.perf_counter()
+    result = subprocess.run(argv, cwd=cwd, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, result
+
+def median_ms(argv, cwd, repeat):
+    _run(argv, cwd)  # warm the filesystem and bytecode caches
+    return statistics.median(_run(argv, cwd)[0] for _ in range(repeat)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs of capi --help')
+    parser.add_argument('--max-ms', type=float, default=200.0, help='Allowed median for capi --help')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='capi-startup-') as cwd:
+        baseline = median_ms([sys.executable, '-c', 'pass'], cwd, args.repeat)
+        help_ms = median_ms([sys.executable, '-c', CHILD_CODE, '--help'], cwd, args.repeat)
+        print(f"python -c pass {baseline:8.1f} ms")
+        print(f"capi --help    {help_ms:8.1f} ms  (limit {args.max_ms:.0f} ms)")
+        if help_ms > args.max_ms:
+            failures.append(f"capi --help took {help_ms:.1f} ms, over the {args.max_ms:.0f} ms limit")
+
+        for command, forbidden in CHECKS:
+            _, result = _run([sys.executable, '-X', 'importtime', '-c', CHILD_CODE, *command], cwd)
+            records, _ = parse_importtime(result.stderr)
+            imported = {r.package for r in records}
+            leaked = sorted(set(forbidden) & imported)
+            total = sum(r.cumulative_us for r in records if r.depth == 0) / 1000
+            print(f"capi {' '.join(command):<28} {total:8.1f} ms imports, {len(records)} modules"
+                  + (f"  LEAKED: {', '.join(leaked)}" if leaked else ""))
+            if result.returncode:
+                failures.append(f"capi {' '.join(command)} exited with {result.returncode}")
+            if leaked:
+                failures.append(f"capi {' '.join(command)} imported {', '.join(leaked)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
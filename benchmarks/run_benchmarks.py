@@ -0,0 +1,269 @@
+"""Time capi's packing paths against synthetic repositories.
+
+Usage:
+    python benchmarks/run_benchmarks.py --files 1000,10000 --repeat 5 --output results.json
+    python benchmarks/run_benchmarks.py --files 10000 --compare results.json
+
+Each size gets a freshly generated repository (see synthetic_repo.py) and
+every case is timed ``--repeat`` times after one warm-up run. Results are
+written as JSON so runs of different capi versions on the same machine can
+be compared with ``--compare``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import queue
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Always measure the cold in-process paths, never a running capi serve
+os.environ['CAPI_NO_DAEMON'] = '1'
+
+from synthetic_repo import RepoSpec, add_spec_arguments, generate_repo, spec_from_args  # noqa: E402
+from capi.commands.again import copy_again  # noqa: E402
+from capi.commands.context import copy_code_context  # noqa: E402
+from capi.utils.snapshot import ProjectSnapshot  # noqa: E402
+from capi.utils.structure_utils import generate_directory_structure  # noqa: E402
+
+class _HeadlessTree:
+    """Just enough of ttk.Treeview for FileTreeView to run without a display."""
+
+    def __init__(self):
+        self.children = {'': []}
+        self.count = 0
+
+    def insert(self, parent, index, text='', **kwargs):
+        self.count += 1
+        item = f"I{self.count}"
+        self.children[item] = []
+        self.children[parent].append(item)
+        return item
+
+    def get_children(self, item=''):
+        return tuple(self.children.get(item, ()))
+
+    def delete(self, *items):
+        for item in items:
+            for child in self.children.pop(item, ()):
+                self.delete(child)
+            for siblings in self.children.values():
+                if item in siblings:
+                    siblings.remove(item)
+                    break
+
+    def item(self, item, option=None, **kwargs):
+        return () if option else {}
+
+    def move(self, item, parent, index):
+        for siblings in self.children.values():
+            if item in siblings:
+                siblings.remove(item)
+                break
+        self.children[parent].insert(index, item)
+
+class _HeadlessWindow:
+    """Runs ``after`` callbacks when asked instead of from a Tk event loop."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run_pending(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+def _headless_view(root):
+    from capi.commands.ui import FileTreeView
+    view = FileTreeView.__new__(FileTreeView)
+    view.prompt_dir = root
+    view.tree = _HeadlessTree()
+    view.selected_paths = set()
+    view.item_paths = {}
+    view.path_items = {}
+    view.unexpanded = set()
+    view.filtered = False
+    view.line_ranges = {}
+    view.window = _HeadlessWindow()
+    view.scan_queue = queue.Queue()
+    view.scan_thread = None
+    view.relevance = None
+    view.update_status = lambda: None
+    return view
+
+def _ui_cache_files(root):
+    _headless_view(root).cache_files()
+
+def _ui_populate_tree(root):
+    view = _headless_view(root)
+    view.cache_files()
+    view.populate_tree()
+
+def _ui_filter_tree(root):
+    view = _headless_view(root)
+    view.cache_files()
+    view.filter_tree('module_1')
+
+def _ui_search_typing(root):
+    # One filter per keystroke, as if the debounce never coalesced any
+    view = _headless_view(root)
+    view.cache_files()
+    for end in range(1, len('pkg1/module_1') + 1):
+        view.filter_tree('pkg1/module_1'[:end])
+
+def _ui_background_scan(root):
+    # From an empty window to the finished tree, draining the queue as the mainloop would
+    view = _headless_view(root)
+    view.start_scan()
+    while view.scan_thread is not None:
+        view.scan_thread.join(0.01)
+        view.window.run_pending()
+
+def _completer_get_files(root):
+    from capi.commands.file_browser_mode.file_completer import FileCompleter
+    completer = FileCompleter()
+    completer.prompt_dir = root
+    completer.get_files()
+
+def _completer_typing(root):
+    # One completion per keystroke, as prompt_toolkit asks with complete_while_typing
+    from prompt_toolkit.document import Document
+    from capi.commands.file_browser_mode.file_completer import FileCompleter
+    completer = FileCompleter()
+    completer.prompt_dir = root
+    line = 'file pkg1/module_1'
+    for end in range(len('file ') + 1, len(line) + 1):
+        list(completer.get_completions(Document(line[:end]), None))
+
+CASES = {
+    'scan': lambda root: ProjectSnapshot.scan(root),
+    'structure_tree': lambda root: generate_directory_structure(root, format='tree'),
+    'structure_json': lambda root: generate_directory_structure(root, format='json'),
+    'code_files_cold': lambda root: copy_code_context(root, True, True, True, use_cache=False, out=os.devnull),
+    'code_files_cached': lambda root: copy_code_context(root, True, True, True, out=os.devnull),
+    'again_cold': lambda root: copy_again(root, use_cache=False, out=os.devnull),
+    'again_cached': lambda root: copy_again(root, out=os.devnull),
+    'ui_cache_files': _ui_cache_files,
+    'ui_populate_tree': _ui_populate_tree,
+    'ui_filter_tree': _ui_filter_tree,
+    'ui_search_typing': _ui_search_typing,
+    'ui_background_scan': _ui_background_scan,
+    'completer_get_files': _completer_get_files,
+    'completer_typing': _completer_typing,
+}
+
+def time_case(fn, root, repeat):
+    # The warm-up run also fills the content cache for the *_cached cases
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        fn(root)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(root)
+            timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, cases, repeat, spec_args, workdir=None, keep=False):
+    results = []
+    repos = []
+    for files in sizes:
+        root = tempfile.mkdtemp(prefix=f"capi-bench-{files}-", dir=workdir)
+        spec = spec_from_args(spec_args, files) if spec_args else RepoSpec(files=files)
+        start = time.perf_counter()
+        repo = generate_repo(root, spec)
+        repo["generated_in"] = time.perf_counter() - start
+        repos.append(repo)
+        print(f"Generated {files} files in {repo['generated_in']:.1f}s at {root}", file=sys.stderr)
+        try:
+            for name in cases:
+                try:
+                    timing = time_case(CASES[name], root, repeat)
+                except ImportError as e:
+                    # e.g. tkinter or prompt_toolkit missing on this machine
+                    print(f"  {name:<22} skipped ({e})", file=sys.stderr)
+                    results.append({"case": name, "files": files, "skipped": str(e)})
+                    continue
+                print(f"  {name:<22} {timing['median'] * 1000:10.1f} ms", file=sys.stderr)
+                results.append({"case": name, "files": files, "repeat": repeat, **timing})
+        finally:
+            if not keep:
+                shutil.rmtree(root, ignore_errors=True)
+    return {
+        "capi_revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repos": repos,
+        "results": results,
+    }
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r["case"], r["files"]): r for r in baseline["results"] if "median" in r}
+    print(f"{'case':<22} {'files':>8} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for result in current["results"]:
+        old = before.get((result["case"], result["files"]))
+        if old is None or "median" not in result:
+            continue
+        change = result["median"] / old["median"] - 1 if old["median"] else 0.0
+        print(f"{result['case']:<22} {result['files']:>8} {old['median'] * 1000:>11.1f} "
+              f"{result['median'] * 1000:>11.1f} {change:>+8.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', default='1000,10000',
+                        help='Comma-separated repository sizes, e.g. 1000,10000,100000,500000')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f"Comma-separated cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', help='Print the change against a previous JSON result file')
+    parser.add_argument('--workdir', help='Where to generate repositories (default: the temp dir)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated repositories')
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.files.split(',')]
+
+    results = run(sizes, cases, args.repeat, args, args.workdir, args.keep)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif not args.compare:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Generate synthetic repositories for the capi benchmarks.
+
+Usage:
+    python benchmarks/synthetic_repo.py DEST --files 10000 --depth 5
+
+The layout is deterministic for a given seed, so two capi versions can be
+timed against byte-identical trees.
+"""
+import argparse
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+
+# Extensions for text files; the .log/.tmp ones are matched by the generated .gitignore
+TEXT_EXTENSIONS = ['.py'] * 6 + ['.js', '.ts', '.md', '.json', '.txt', '.toml', '.log', '.tmp']
+BINARY_EXTENSIONS = ['.png', '.bin', '.so', '.zip']
+# Rules roughly in order of how often real projects use them
+IGNORE_RULES = [
+    '*.log', 'build/', '/dist', '*.tmp', '!keep.log', '**/generated/**', 'cache_*/',
+    '*.min.js', 'docs/_build/', '/coverage', '**/fixtures/*.json', '.env*', '*.bak',
+    'tmp_*', '!tmp_keep*', 'out/**/*.txt', '*.o', '*.class', 'target/', '**/.idea',
+]
+WORDS = ['data', 'value', 'result', 'config', 'item', 'index', 'buffer', 'node', 'path', 'count']
+
+@dataclass
+class RepoSpec:
+    files: int = 1000
+    depth: int = 4
+    binary_ratio: float = 0.05
+    ignore_rules: int = 8
+    nested_ignores: int = 4
+    min_size: int = 200
+    max_size: int = 64 * 1024
+    selection: int = 200
+    seed: int = 0
+
+def _text(rng: random.Random, size: int) -> bytes:
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        word = rng.choice(WORDS)
+        line = f"    {word}_{n} = compute_{rng.choice(WORDS)}({word}, {rng.randrange(1000)})  # {word}"
+        if n % 12 == 0:
+            line = f"\ndef {word}_handler_{n}({word}, *args):"
+        lines.append(line)
+        total += len(line) + 1
+        n += 1
+    return "\n".join(lines).encode()[:size]
+
+def _size(rng: random.Random, spec: RepoSpec) -> int:
+    # Heavy-tailed like real source trees: most files small, a few large
+    return int(min(spec.max_size, spec.min_size * rng.paretovariate(1.2)))
+
+def _directory(rng: random.Random, spec: RepoSpec, fanout: int) -> str:
+    depth = rng.randint(0, spec.depth)
+    return "/".join(f"pkg{rng.randrange(fanout)}" for _ in range(depth))
+
+def generate_repo(root: str, spec: RepoSpec) -> dict:
+    """Write the repository described by ``spec`` under ``root`` and return a summary."""
+    rng = random.Random(spec.seed)
+    # Aim for roughly 20 files per leaf directory
+    fanout = max(2, round((spec.files / 20) ** (1 / max(spec.depth, 1))))
+    os.makedirs(os.path.join(root, 'prompting', 'cli'), exist_ok=True)
+
+    rules = IGNORE_RULES[:spec.ignore_rules]
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write("\n".join(rules) + "\n")
+
+    text_files = []
+    binary_files = 0
+    total_bytes = 0
+    created_dirs = set()
+    for i in range(spec.files):
+        rel_dir = _directory(rng, spec, fanout)
+        if rng.random() < spec.binary_ratio:
+            name = f"asset_{i}{rng.choice(BINARY_EXTENSIONS)}"
+            content = b"\x00" + rng.randbytes(_size(rng, spec))
+            binary_files += 1
+        else:
+            name = f"module_{i}{rng.choice(TEXT_EXTENSIONS)}"
+            content = _text(rng, _size(rng, spec))
+            text_files.append(f"{rel_dir}/{name}" if rel_dir else name)
+        full_dir = os.path.join(root, *rel_dir.split('/')) if rel_dir else root
+        if rel_dir not in created_dirs:
+            os.makedirs(full_dir, exist_ok=True)
+            created_dirs.add(rel_dir)
+        with open(os.path.join(full_dir, name), 'wb') as f:
+            f.write(content)
+        total_bytes += len(content)
+
+    # Nested .gitignore files make the matcher load and chain extra pattern sets
+    for rel_dir in sorted(d for d in created_dirs if d)[:spec.nested_ignores]:
+        with open(os.path.join(root, *rel_dir.split('/'), '.gitignore'), 'w') as f:
+            f.write("*.txt\n!module_1*.txt\n")
+
+    # An always-ignored directory that the walker should never descend into
+    vendored = os.path.join(root, 'node_modules', 'dep')
+    os.makedirs(vendored, exist_ok=True)
+    for i in range(min(spec.files // 10, 1000)):
+        with open(os.path.join(vendored, f"index_{i}.js"), 'w') as f:
+            f.write("module.exports = {};\n")
+
+    selection = sorted(rng.sample(text_files, min(spec.selection, len(text_files))))
+    with open(os.path.join(root, 'prompting', 'cli', 'last_selection.json'), 'w') as f:
+        json.dump({"files": selection}, f, indent=2)
+    with open(os.path.join(root, 'prompting', 'cli', 'ctx.xml'), 'w') as f:
+        f.write("<context>Synthetic benchmark repository</context>\n")
+
+    return {
+        **asdict(spec),
+        "text_files": len(text_files),
+        "binary_files": binary_files,
+        "bytes": total_bytes,
+        "directories": len(created_dirs),
+    }
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = RepoSpec()
+    parser.add_argument('--depth', type=int, default=defaults.depth, help='Maximum directory depth')
+    parser.add_argument('--binary-ratio', type=float, default=defaults.binary_ratio,
+                        help='Fraction of files that are binary')
+    parser.add_argument('--ignore-rules', type=int, default=defaults.ignore_rules,
+                        help=f'Number of root .gitignore rules (max {len(IGNORE_RULES)})')
+    parser.add_argument('--nested-ignores', type=int, default=defaults.nested_ignores,
+                        help='Number of directories that get their own .gitignore')
+    parser.add_argument('--min-size', type=int, default=defaults.min_size, help='Typical file size in bytes')
+    parser.add_argument('--max-size', type=int, default=defaults.max_size, help='Largest file size in bytes')
+    parser.add_argument('--selection', type=int, default=defaults.selection,
+                        help='Number of files in last_selection.json')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+def spec_from_args(args: argparse.Namespace, files: int) -> RepoSpec:
+    return RepoSpec(
+        files=files, depth=args.depth, binary_ratio=args.binary_ratio,
+        ignore_rules=args.ignore_rules, nested_ignores=args.nested_ignores,
+        min_size=args.min_size, max_size=args.max_size, selection=args.selection, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dest', help='Directory to create the repository in')
+    parser.add_argument('--files', type=int, default=1000, help='Number of files (excluding node_modules)')
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    summary = generate_repo(args.dest, spec_from_args(args, args.files))
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
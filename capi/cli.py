@@ -1,19 +1,141 @@
 import click
 import os
 
+def _budget_options(f):
+    """Shared --budget/--priority options for the packing commands."""
+    f = click.option('--priority', default='selected,recent,small', show_default=True,
+                     help='Comma-separated ranking rules used with --budget: selected, recent, small, large')(f)
+    f = click.option('--budget', type=str, default=None,
+                     help='Token budget for the pack, or an agent id with context_window in agents.json')(f)
+    return f
+
+def _size_options(f):
+    """Shared large-file policy options for the packing commands."""
+    f = click.option('--large-files', type=click.Choice(['headtail', 'truncate', 'skip', 'full']),
+                     default='headtail', show_default=True,
+                     help='How to include files over --max-file-size')(f)
+    f = click.option('--max-file-size', type=click.IntRange(min=1), default=2 * 1024 * 1024,
+                     show_default=True, help='Size in bytes above which --large-files applies')(f)
+    return f
+
+def _structure_options(f):
+    """Shared structure rendering limits for the packing commands."""
+    f = click.option('--max-entries-per-dir', type=click.IntRange(min=1), default=None,
+                     help='Collapse larger directories to "… N more files" in the structure')(f)
+    f = click.option('--max-depth', type=click.IntRange(min=1), default=None,
+                     help='Maximum directory depth shown in the structure')(f)
+    return f
+
+def _outline_options(f):
+    """Shared --outline/--full options for the packing commands."""
+    f = click.option('--full', multiple=True, metavar='PATTERN',
+                     help='With --outline, pack files matching this glob in full (repeatable)')(f)
+    f = click.option('--outline', is_flag=True,
+                     help='Pack docstrings, signatures and top-level assignments instead of full files')(f)
+    return f
+
+def _split_options(f):
+    """Shared --split-tokens/--split-bytes options for the packing commands."""
+    f = click.option('--split-bytes', type=click.IntRange(min=1), default=None, metavar='N',
+                     help='Split the pack at file boundaries into parts of at most N bytes')(f)
+    f = click.option('--split-tokens', type=click.IntRange(min=1), default=None, metavar='N',
+                     help='Split the pack at file boundaries into parts of at most N tokens, '
+                          'written to prompting/cli/parts')(f)
+    return f
+
+def _check_split(out, split_tokens, split_bytes):
+    if out is not None and (split_tokens or split_bytes):
+        raise click.UsageError('--out cannot be combined with --split-tokens/--split-bytes; '
+                               'parts are written to prompting/cli/parts')
+
+def _resolve_budget(budget, priority, src=None):
+    """Parse --budget/--priority; agent ids are looked up in the project's own agents.json."""
+    from .utils.token_budget import parse_priority, resolve_budget
+    agents_path = os.path.join(src or '.', 'prompting', 'cli', 'agents.json')
+    try:
+        return resolve_budget(budget, agents_path), parse_priority(priority)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+def _start_profiling(ctx, profile_json, profile_pstats):
+    """Profile the invoked command and report once it finishes."""
+    from .utils import profiler
+    profiler.start()
+    cprofile = None
+    if profile_pstats:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+
+    def finish():
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(profile_pstats)
+        stats = profiler.stop()
+        for line in stats.table():
+            click.echo(line, err=True)
+        if profile_json:
+            stats.dump_json(profile_json)
+            click.echo(f"Profile written to {profile_json}", err=True)
+        if profile_pstats:
+            click.echo(f"cProfile stats written to {profile_pstats}", err=True)
+
+    ctx.call_on_close(finish)
+
+def _startup_profile(ctx, param, value):
+    """Re-run the rest of the command line under -X importtime and report where startup goes."""
+    if not value or ctx.resilient_parsing:
+        return
+    import sys
+    from .utils.startup import STARTUP_PROFILE_FLAG, run_with_importtime, startup_report
+    args = [arg for arg in sys.argv[1:] if arg != STARTUP_PROFILE_FLAG]
+    records, stderr, wall, code = run_with_importtime(args)
+    for line in stderr:
+        click.echo(line, err=True)
+    for line in startup_report(records, wall):
+        click.echo(line, err=True)
+    ctx.exit(code)
+
 @click.group()
-def cli():
+@click.option('--startup-profile', is_flag=True, is_eager=True, expose_value=False,
+              callback=_startup_profile,
+              help='Run the command under python -X importtime and report the slowest imports')
+@click.option('--profile', is_flag=True, help='Print per-phase time, call counts and memory after the command')
+@click.option('--profile-json', type=click.Path(dir_okay=False), default=None,
+              help='Also write the profile as JSON to FILE (implies --profile)')
+@click.option('--profile-pstats', type=click.Path(dir_okay=False), default=None,
+              help='Also run cProfile and dump its stats to FILE (implies --profile)')
+@click.pass_context
+def cli(ctx, profile, profile_json, profile_pstats):
     """CLI tool for managing project context and structure."""
-    pass
+    if profile or profile_json or profile_pstats:
+        _start_profiling(ctx, profile_json, profile_pstats)
 
 @cli.command()
 @click.option('--files', is_flag=True, help='Include file contents')
 @click.option('--str', 'structure', is_flag=True, help='Include project structure')
 @click.option('--ctx', is_flag=True, help='Include context from ctx.xml')
 @click.option('--format', type=click.Choice(['tree', 'json']), default='tree', help='Structure format')
-def code(files, structure, ctx, format):
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None, help='Number of parallel file readers')
+@click.option('--no-cache', is_flag=True, help='Bypass the content cache in prompting/cli/cache')
+@click.option('--out', '-o', type=str, default=None, help="Stream the pack to FILE, or '-' for stdout, instead of the clipboard")
+@click.option('--minify', is_flag=True, help='Strip comments, docstrings and redundant whitespace from files')
+@click.option('--query', '-q', type=str, default=None,
+              help='Pack only the files most relevant to this question (local BM25 index)')
+@click.option('--top', type=click.IntRange(min=1), default=20, show_default=True,
+              help='Number of files to pack with --query')
+@_outline_options
+@_budget_options
+@_size_options
+@_structure_options
+@_split_options
+def code(files, structure, ctx, format, jobs, no_cache, out, minify, query, top, outline, full, budget,
+         priority, max_file_size, large_files, max_depth, max_entries_per_dir, split_tokens, split_bytes):
     """Copy project context based on specified flags. If no flags, includes everything."""
     from .commands.context import copy_code_context
+    from .utils.large_files import SizePolicy
+    budget, priority = _resolve_budget(budget, priority)
+    _check_split(out, split_tokens, split_bytes)
     if not any([files, structure, ctx]):
         files = structure = ctx = True
     
@@ -22,18 +144,42 @@ def code(files, structure, ctx, format):
         include_files=files,
         include_structure=structure,
         include_context=ctx,
-        format=format
+        format=format,
+        jobs=jobs,
+        use_cache=not no_cache,
+        out=out,
+        budget=budget,
+        priority=priority,
+        policy=SizePolicy(max_bytes=max_file_size, mode=large_files),
+        max_depth=max_depth,
+        max_entries=max_entries_per_dir,
+        minify=minify,
+        outline=outline,
+        full=full,
+        query=query,
+        top=top,
+        split_tokens=split_tokens,
+        split_bytes=split_bytes
     )
 
 @cli.command()
 @click.option('--src', type=click.Path(exists=True), help='Source directory (defaults to current directory)')
 @click.option('--include-structure', type=int, default=1, help='Include project structure (1=yes, 0=no)')
-def ui(src, include_structure):
+@click.option('--minify', is_flag=True, help='Start with the Minify checkbox ticked')
+@click.option('--deps', type=click.IntRange(min=1), default=1, show_default=True, metavar='DEPTH',
+              help='Initial import depth for the Add imports button')
+@click.option('--target', type=str, default=None, metavar='AGENT',
+              help='Agent id in agents.json whose warning threshold the size meter uses')
+@_outline_options
+@_budget_options
+def ui(src, include_structure, minify, deps, target, outline, full, budget, priority):
     """Open UI selector"""
     from .commands.ui import open_ui
+    budget, priority = _resolve_budget(budget, priority, src)
     if not src:
         src = '.'
-    open_ui(src, include_structure)
+    open_ui(src, include_structure, budget=budget, priority=priority, minify=minify,
+            outline=outline, full=full, deps=deps, target=target)
 
 @cli.command()
 @click.option('--src', type=click.Path(exists=True), help='Source directory (defaults to current directory)')
@@ -46,12 +192,52 @@ def init(src):
 
 @cli.command()
 @click.option('--src', type=click.Path(exists=True), help='Source directory (defaults to current directory)')
-def again(src):
-    """Recopy last selection"""
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None, help='Number of parallel file readers')
+@click.option('--no-cache', is_flag=True, help='Bypass the content cache in prompting/cli/cache')
+@click.option('--out', '-o', type=str, default=None, help="Stream the pack to FILE, or '-' for stdout, instead of the clipboard")
+@click.option('--changed', is_flag=True, help='Only emit files whose content changed since the last copy')
+@click.option('--minify', is_flag=True, help='Strip comments, docstrings and redundant whitespace from files')
+@click.option('--deps', type=click.IntRange(min=0), default=0, metavar='DEPTH',
+              help='Also pack files the selection imports, up to DEPTH hops away')
+@click.option('--part', type=click.IntRange(min=1), default=None, metavar='K',
+              help='Copy part K of the last split pack instead of packing again')
+@_outline_options
+@_budget_options
+@_size_options
+@_structure_options
+@_split_options
+def again(src, jobs, no_cache, out, changed, minify, deps, part, outline, full, budget, priority,
+          max_file_size, large_files, max_depth, max_entries_per_dir, split_tokens, split_bytes):
+    """Recopy last selection. Entries may be path:start-end line ranges."""
+    if not src:
+        src = '.'
+    if part is not None:
+        from .commands.again import copy_part
+        copy_part(src, part, out=out)
+        return
     from .commands.again import copy_again
+    from .utils.large_files import SizePolicy
+    budget, priority = _resolve_budget(budget, priority, src)
+    _check_split(out, split_tokens, split_bytes)
+    copy_again(src, jobs=jobs, use_cache=not no_cache, out=out, budget=budget,
+               priority=priority, changed=changed,
+               policy=SizePolicy(max_bytes=max_file_size, mode=large_files),
+               max_depth=max_depth, max_entries=max_entries_per_dir, minify=minify,
+               outline=outline, full=full, deps=deps, split_tokens=split_tokens,
+               split_bytes=split_bytes)
+
+@cli.command()
+@click.option('--src', type=click.Path(exists=True), help='Source directory (defaults to current directory)')
+@click.option('--poll-interval', type=click.FloatRange(min=0.1), default=1.0, help='Seconds between change checks')
+@click.option('--detach', is_flag=True, help='Run the daemon in the background')
+@click.option('--stop', is_flag=True, help='Stop the running daemon for this project')
+@click.option('--status', is_flag=True, help='Show what the running daemon has indexed')
+def serve(src, poll_interval, detach, stop, status):
+    """Keep a warm project index that code, again, ui and file reuse."""
+    from .commands.serve import serve_project
     if not src:
         src = '.'
-    copy_again(src)
+    serve_project(src, poll_interval=poll_interval, detach=detach, stop=stop, status=status)
 
 @cli.command()
 @click.argument('agent_id', required=False, default='coder')
@@ -1,63 +1,194 @@
 import os
 import json
 import click
-import pyperclip
-from ..utils.file_utils import get_file_contents, get_gitignore_patterns
+from functools import partial
+from ..utils import profiler
+from ..utils.content_cache import ContentCache
+from ..utils.file_reader import ParallelFileReader
+from ..utils.index_client import load_snapshot
+from ..utils.pack_writer import PackWriter, SplitPackWriter, list_parts, open_pack_writer, write_files
+from ..utils.selection import load_selection_data, save_selection
 from ..utils.structure_utils import generate_directory_structure
+from ..utils.token_budget import DEFAULT_PRIORITY, TokenBudget, estimate_tokens
 
-def copy_again(prompt_dir):
-    """Copy last selection again."""
+def copy_again(prompt_dir, jobs=None, use_cache=True, out=None, budget=None,
+               priority=DEFAULT_PRIORITY, changed=False, policy=None, max_depth=None,
+               max_entries=None, minify=False, outline=False, full=(), deps=0, split_tokens=None,
+               split_bytes=None):
+    """Copy last selection again, or stream it to ``out`` (a path or ``-``).
+
+    With ``changed`` only files whose content hash differs from the manifest
+    recorded at the last copy are emitted; the rest are listed by path.
+    Selection entries may be ``path:start-end`` line ranges. ``minify`` strips
+    comments, docstrings and redundant whitespace from file contents and
+    ``outline`` packs signatures instead of bodies, except for files matching
+    a ``full`` glob pattern. ``deps`` adds the files the selection imports, up
+    to that many hops away. ``split_tokens``/``split_bytes`` cap the size of
+    each part and write the parts to prompting/cli/parts/.
+    """
     if prompt_dir == '.':
         prompt_dir = os.getcwd()
 
-    selection_file = os.path.join(prompt_dir, 'prompting', 'cli', 'last_selection.json')
+    last_selection = load_selection_data(prompt_dir)
     
-    if not os.path.exists(selection_file):
+    if last_selection is None:
         click.echo("Error: No previous selection found. Please run init first.")
         return
 
-    with open(selection_file, 'r') as f:
-        last_selection = json.load(f)
-
     if not last_selection.get("files"):
         click.echo("Error: No previous selection found. Please use ui first.")
         return
 
-    output_parts = []
-    
-    # Add files section
-    files_content = ["<project-files>"]
-    for file in sorted(last_selection["files"]):
-        full_path = os.path.join(prompt_dir, file)
-        content = get_file_contents(full_path)
-        if content is not None:
-            files_content.append(f"```{file}\n{content}\n```")
-    files_content.append("</project-files>")
-    output_parts.append("\n".join(files_content))
+    # Keep stdout clean for the pack itself when streaming to it
+    echo = partial(click.echo, err=out == '-')
 
-    # Add structure section
-    ignore_patterns = get_gitignore_patterns(prompt_dir)
-    always_ignore = ['venv', '__pycache__', '.git', 'node_modules', '.gitignore', 'capi.egg-info']
-    structure = generate_directory_structure(prompt_dir, ignore_patterns, always_ignore)
-    structure_content = [
+    cache = ContentCache.open(prompt_dir) if use_cache else None
+    try:
+        with open_pack_writer(prompt_dir, out, split_tokens, split_bytes) as writer:
+            reader, files, unchanged, truncated = _write_pack(
+                writer, echo, prompt_dir, last_selection["files"], jobs, cache,
+                budget, priority, policy, (max_depth, max_entries),
+                last_selection.get("manifest", {}) if changed else None,
+                minify=minify, outline=outline, full=full, deps=deps
+            )
+    finally:
+        if cache:
+            with profiler.phase("cache"):
+                cache.close()
+
+    # Record what was just copied so the next --changed run diffs against it
+    manifest = dict(last_selection.get("manifest", {}))
+    manifest.update(reader.digests)
+    # Truncated files were not sent in full, so the next --changed run must send them again
+    for path in truncated:
+        manifest.pop(path, None)
+    save_selection(prompt_dir, last_selection["files"], manifest, tracked=files)
+
+    copied = len(files) - len(unchanged)
+    if isinstance(writer, SplitPackWriter):
+        for line in writer.report():
+            echo(line)
+    if writer.to_clipboard:
+        echo(f"Recopied {copied} files from last selection!")
+    else:
+        echo(f"Wrote {copied} files from last selection to {writer.describe()}!")
+    if changed:
+        echo(f"Skipped {len(unchanged)} unchanged files.")
+    echo(reader.stats.summary())
+
+def copy_part(prompt_dir, number, out=None):
+    """Copy part ``number`` of the last split pack, or write it to ``out``."""
+    if prompt_dir == '.':
+        prompt_dir = os.getcwd()
+
+    parts = list_parts(prompt_dir)
+    if not parts:
+        click.echo("Error: No split pack found. Please use --split-tokens or --split-bytes first.")
+        return
+    if number > len(parts):
+        click.echo(f"Error: Part {number} does not exist; the last pack has {len(parts)} parts.")
+        return
+
+    echo = partial(click.echo, err=out == '-')
+    with open(parts[number - 1], 'r', encoding='utf-8') as f:
+        text = f.read()
+    with PackWriter(out) as writer:
+        writer.write_section(text)
+
+    if writer.to_clipboard:
+        echo(f"Copied part {number} of {len(parts)} to clipboard!")
+    else:
+        echo(f"Wrote part {number} of {len(parts)} to {writer.describe()}!")
+    if number < len(parts):
+        echo(f"Run 'capi again --part {number + 1}' for the next part.")
+
+def _split_changed(prompt_dir, files, jobs, cache, snapshot, policy, manifest):
+    """Partition files into (changed, unchanged) by comparing content hashes to the manifest."""
+    digest_reader = ParallelFileReader(prompt_dir, jobs, cache=cache, meta=snapshot.meta,
+                                       policy=policy, remote=snapshot.remote)
+    for _ in digest_reader.read(files):
+        pass
+    changed, unchanged = [], []
+    for file in files:
+        digest = digest_reader.digests.get(file)
+        if digest is not None and manifest.get(file) == digest:
+            unchanged.append(file)
+        else:
+            changed.append(file)
+    return changed, unchanged
+
+def _write_pack(writer, echo, prompt_dir, files, jobs, cache, budget, priority, policy,
+                limits=(None, None), manifest=None, minify=False, outline=False, full=(), deps=0):
+    # Stat the tree once; the cache then serves unchanged files without reading them
+    with profiler.phase("scan"):
+        snapshot = load_snapshot(prompt_dir, cache=cache)
+    # The --out file already exists by now; never pack the pack into itself
+    if writer.path:
+        snapshot.discard(writer.path)
+
+    # Build structure and context first so they count against the budget
+    max_depth, max_entries = limits
+    structure = generate_directory_structure(prompt_dir, snapshot, max_depth=max_depth,
+                                             max_entries=max_entries)
+    structure_section = "\n".join([
         "\n<project-structure description=\"This represents the structure of the directory. Use this tag to ensure proper referencing of files, functions, etc...\">\n    ",
         json.dumps(structure, indent=4),
         "</project-structure>"
-    ]
-    output_parts.append("\n".join(structure_content))
+    ])
 
-    # Add context from ctx.xml if it exists
+    context_section = None
     ctx_path = os.path.join(prompt_dir, 'prompting', 'cli', 'ctx.xml')
     if os.path.exists(ctx_path):
         try:
             with open(ctx_path, 'r', encoding='utf-8') as f:
                 context_content = f.read()
-            output_parts.append(f"\n<context>\n{context_content}\n</context>")
+            context_section = f"\n<context>\n{context_content}\n</context>"
         except Exception as e:
             click.echo(f"Warning: Could not read ctx.xml: {e}", err=True)
 
-    # Join all parts and copy to clipboard
-    final_output = "\n\n".join(output_parts)
-    pyperclip.copy(final_output)
-    
-    click.echo(f"Recopied {len(last_selection['files'])} files from last selection!")
\ No newline at end of file
+    if deps:
+        from ..utils.import_graph import ImportGraph
+        with profiler.phase("imports"):
+            graph = ImportGraph(snapshot, ParallelFileReader(prompt_dir, jobs, cache=cache,
+                                                             meta=snapshot.meta, remote=snapshot.remote),
+                                cache)
+            added = graph.expand(files, deps)
+        echo(f"Added {len(added)} imported files (depth {deps}, {graph.parsed} parsed):")
+        for path in added:
+            echo(f"  + {path}")
+        files = list(files) + added
+
+    files = selection = sorted(files)
+    unchanged = []
+    if manifest is not None:
+        with profiler.phase("changed"):
+            files, unchanged = _split_changed(prompt_dir, files, jobs, cache, snapshot, policy, manifest)
+
+    overhead = sum(estimate_tokens(s) for s in (structure_section, context_section) if s)
+    reader, _, truncated = write_files(
+        writer, files,
+        partial(ParallelFileReader, prompt_dir, jobs, cache=cache, meta=snapshot.meta, policy=policy,
+                remote=snapshot.remote),
+        snapshot.meta, cache,
+        budget=TokenBudget(budget, priority, overhead) if budget is not None else None,
+        outline=outline, full=full, minify=minify, echo=echo
+    )
+
+    # List the files left out because they have not changed since the last copy
+    if unchanged:
+        writer.write_section("\n".join([
+            "<unchanged-files description=\"These files are unchanged since the last copy and were omitted\">",
+            *unchanged,
+            "</unchanged-files>"
+        ]))
+
+    # Add structure section
+    writer.write_section(structure_section)
+
+    # Add context from ctx.xml if it exists
+    if context_section is not None:
+        writer.write_section(context_section)
+
+    if snapshot.remote is not None:
+        snapshot.remote.close()
+    return reader, selection, unchanged, truncated
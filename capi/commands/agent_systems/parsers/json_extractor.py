@@ -1,6 +1,5 @@
 import json
 import click
-from jsonpath_ng import parse
 from typing import Any, Dict
 
 def extract_json_response(data: str, config: Dict[str, Any]) -> Dict[str, Any]:
@@ -25,6 +24,8 @@ def extract_json_response(data: str, config: Dict[str, Any]) -> Dict[str, Any]:
         click.secho(f"Invalid JSON: {str(e)}", fg='red')
         raise
     
+    from jsonpath_ng import parse
+
     results = {}
     
     for field_name, field_config in config.get('structure', {}).items():
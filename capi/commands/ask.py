@@ -1,7 +1,5 @@
 import os
 import json
-from dotenv import load_dotenv
-from ..utils.llm_api_caller import LLMApiCaller
 import click
 
 def load_agents(json_path='prompting/cli/agents.json'):
@@ -11,6 +9,8 @@ def load_agents(json_path='prompting/cli/agents.json'):
     return agents
 
 def handle_ask(agent_id):
+    from dotenv import load_dotenv
+    from ..utils.llm_api_caller import LLMApiCaller
     load_dotenv()
     api_key = os.getenv("DEEPINFRA_API_TOKEN")
     if not api_key:
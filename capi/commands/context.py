@@ -1,88 +1,152 @@
 import click
 import os
-import json
-import pyperclip
+from functools import partial
 from pathlib import Path
-from ..utils.file_utils import (
-    get_gitignore_patterns,
-    get_file_contents,
-    is_binary_file,
-    should_ignore
-)
+from typing import Optional, Sequence
+from ..utils import profiler
+from ..utils.content_cache import ContentCache
+from ..utils.file_reader import ParallelFileReader
+from ..utils.index_client import load_snapshot
+from ..utils.large_files import SizePolicy
+from ..utils.pack_writer import PackWriter, SplitPackWriter, open_pack_writer, write_files
+from ..utils.selection import load_selection
 from ..utils.structure_utils import generate_directory_structure
+from ..utils.token_budget import DEFAULT_PRIORITY, TokenBudget, estimate_tokens
 
 def copy_code_context(src_dir: str, include_files: bool, include_structure: bool, 
-                     include_context: bool, format: str = "tree") -> None:
-    """Generate project context based on specified flags and copy to clipboard."""
+                     include_context: bool, format: str = "tree", jobs: Optional[int] = None,
+                     use_cache: bool = True, out: Optional[str] = None,
+                     budget: Optional[int] = None,
+                     priority: Sequence[str] = DEFAULT_PRIORITY,
+                     policy: Optional[SizePolicy] = None,
+                     max_depth: Optional[int] = None,
+                     max_entries: Optional[int] = None,
+                     minify: bool = False,
+                     outline: bool = False,
+                     full: Sequence[str] = (),
+                     query: Optional[str] = None,
+                     top: int = 20,
+                     split_tokens: Optional[int] = None,
+                     split_bytes: Optional[int] = None) -> None:
+    """Generate project context based on specified flags and copy to clipboard.
+
+    With ``out`` set to a path or ``-`` the pack is streamed there instead.
+    With ``budget`` set, files are chosen (and the last one possibly truncated)
+    so the estimated token count of the whole pack fits. Files over the size
+    ``policy`` limit are sampled rather than read whole. ``max_depth`` and
+    ``max_entries`` limit how much of the structure is rendered. ``minify``
+    strips comments, docstrings and redundant whitespace from file contents.
+    ``outline`` packs signatures instead of bodies, except for files matching
+    a ``full`` glob pattern. With ``query`` only the ``top`` files ranked by
+    the local BM25 index are packed. ``split_tokens``/``split_bytes`` cap the
+    size of each part and write the parts to prompting/cli/parts/.
+    """
     if src_dir == '.':
         src_dir = os.getcwd()
     
-    output_parts = []
+    if (split_tokens or split_bytes) and not os.path.isdir(os.path.join(src_dir, 'prompting', 'cli')):
+        click.echo("Error: Splitting writes to prompting/cli/parts. Please run init first.")
+        return
     
-    # Get ignore patterns
-    ignore_patterns = get_gitignore_patterns(src_dir)
-    always_ignore = ['venv', '__pycache__', '.git', 'node_modules', '.gitignore', 'capi.egg-info']
+    # Keep stdout clean for the pack itself when streaming to it
+    echo = partial(click.echo, err=out == '-')
     
-    # Add files section if requested
-    if include_files:
-        files_content = []
-        all_files = []
-        
-        for prompt, dirs, files in os.walk(src_dir):
-            dirs[:] = [d for d in dirs if not should_ignore(
-                os.path.relpath(os.path.join(prompt, d), src_dir), 
-                ignore_patterns + always_ignore
-            )]
-            
-            for file in files:
-                filepath = os.path.join(prompt, file)
-                rel_path = os.path.relpath(filepath, src_dir)
-                if not should_ignore(rel_path, ignore_patterns + always_ignore):
-                    if not is_binary_file(filepath):
-                        all_files.append(rel_path)
-        
-        all_files.sort()
-        
-        files_content.append("<project-files>")
-        for file in all_files:
-            full_path = os.path.join(src_dir, file)
-            content = get_file_contents(full_path)
-            if content is not None:
-                files_content.append(f"```{file}\n{content}\n```")
-            else:
-                click.echo(f"Error reading file: {file}", err=True)
-        files_content.append("</project-files>")
-        
-        output_parts.append("\n".join(files_content))
-        click.echo(f"Processed {len(all_files)} files.")
+    cache = ContentCache.open(src_dir) if use_cache else None
+    try:
+        with open_pack_writer(src_dir, out, split_tokens, split_bytes) as writer:
+            _write_pack(writer, echo, src_dir, include_files, include_structure,
+                        include_context, jobs, cache, budget, priority, policy,
+                        max_depth, max_entries, minify, outline, full, query, top)
+    finally:
+        if cache:
+            with profiler.phase("cache"):
+                cache.close()
     
-    # Add structure section if requested
+    if isinstance(writer, SplitPackWriter):
+        for line in writer.report():
+            echo(line)
+    if writer.to_clipboard:
+        echo("Content has been copied to clipboard!")
+    else:
+        echo(f"Content has been written to {writer.describe()}!")
+
+def _read_context(src_dir: str) -> Optional[str]:
+    ctx_path = Path(src_dir) / 'prompting' / 'cli' / 'ctx.xml'
+    if not ctx_path.exists():
+        click.echo("Warning: ctx.xml not found at prompting/cli/ctx.xml", err=True)
+        return None
+    try:
+        with open(ctx_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        click.echo(f"Error reading ctx.xml: {e}", err=True)
+        return None
+
+def _write_pack(writer: PackWriter, echo, src_dir: str, include_files: bool,
+                include_structure: bool, include_context: bool, jobs: Optional[int],
+                cache: Optional[ContentCache], budget: Optional[int],
+                priority: Sequence[str], policy: Optional[SizePolicy],
+                max_depth: Optional[int], max_entries: Optional[int], minify: bool,
+                outline: bool, full: Sequence[str], query: Optional[str], top: int) -> None:
+    # Walk the project once; files and structure both come from this snapshot
+    with profiler.phase("scan"):
+        snapshot = load_snapshot(src_dir, cache=cache)
+    # The --out file already exists by now; never pack the pack into itself
+    if writer.path:
+        snapshot.discard(writer.path)
+    
+    # Build the small sections first so their size counts against the budget
+    structure_section = None
     if include_structure:
-        structure = generate_directory_structure(src_dir, ignore_patterns, always_ignore, format="tree")
-        structure_content = [
+        structure = generate_directory_structure(src_dir, snapshot, format="tree",
+                                                 max_depth=max_depth, max_entries=max_entries)
+        structure_section = "\n".join([
             "\n<project-structure>",
             structure,
             "</project-structure>"
-        ]
-        output_parts.append("\n".join(structure_content))
-        click.echo("Added project structure.")
-    
-    # Add context from ctx.xml if requested
+        ])
+    context_section = None
     if include_context:
-        ctx_path = Path(src_dir) / 'prompting' / 'cli' / 'ctx.xml'
-        if ctx_path.exists():
-            try:
-                with open(ctx_path, 'r', encoding='utf-8') as f:
-                    context_content = f.read()
-                output_parts.append(f"\n<context>\n{context_content}\n</context>")
-                click.echo("Added context from ctx.xml")
-            except Exception as e:
-                click.echo(f"Error reading ctx.xml: {e}", err=True)
-        else:
-            click.echo("Warning: ctx.xml not found at prompting/cli/ctx.xml", err=True)
+        with profiler.phase("context"):
+            context_content = _read_context(src_dir)
+        if context_content is not None:
+            context_section = f"\n<context>\n{context_content}\n</context>"
     
-    # Join all parts and copy to clipboard
-    final_output = "\n\n".join(output_parts)
-    pyperclip.copy(final_output)
+    # Add files section if requested
+    if include_files:
+        all_files = snapshot.files
+        selected = load_selection(src_dir)
+        if query:
+            from ..utils.relevance import rank_files
+            with profiler.phase("relevance"):
+                hits = rank_files(src_dir, snapshot, query, top, ParallelFileReader(
+                    src_dir, jobs, cache=cache, meta=snapshot.meta, policy=policy,
+                    remote=snapshot.remote))
+            echo(f"Top {len(hits)} files for \"{query}\":")
+            for path, score in hits:
+                echo(f"{score:9.2f}  {path}")
+            all_files = selected = [path for path, _ in hits]
+        overhead = sum(estimate_tokens(s) for s in (structure_section, context_section) if s)
+        reader, all_files, _ = write_files(
+            writer, all_files,
+            partial(ParallelFileReader, src_dir, jobs, cache=cache, meta=snapshot.meta, policy=policy,
+                    remote=snapshot.remote),
+            snapshot.meta, cache,
+            budget=TokenBudget(budget, priority, overhead) if budget is not None else None,
+            selected=selected, outline=outline, full=full, minify=minify, echo=echo
+        )
+        echo(f"Processed {len(all_files)} files.")
+        echo(reader.stats.summary())
     
-    click.echo("Content has been copied to clipboard!")
\ No newline at end of file
+    # Add structure section if requested
+    if structure_section is not None:
+        writer.write_section(structure_section)
+        echo("Added project structure.")
+    
+    # Add context from ctx.xml if requested
+    if context_section is not None:
+        writer.write_section(context_section)
+        echo("Added context from ctx.xml")
+
+    if snapshot.remote is not None:
+        snapshot.remote.close()
@@ -1,10 +1,24 @@
 from prompt_toolkit.completion import Completer, Completion
 import os
+import time
 from pathlib import Path
+from ...utils.file_utils import BinaryClassifier
+from ...utils.git_index import list_git_files
+from ...utils.index_client import IndexClient
+from ...utils.path_index import PathIndex
+
+# Completions offered per keystroke, best first
+MAX_COMPLETIONS = 50
+# Minimum seconds between checks of directory mtimes for added or removed files
+REFRESH_INTERVAL = 2.0
 
 class FileCompleter(Completer):
     def __init__(self):
         self.prompt_dir = os.getcwd()
+        self.classifier = BinaryClassifier()
+        self.index = None  # PathIndex over get_files(), built on the first completion
+        self.dir_mtimes = {}  # Directory -> mtime_ns when the index was built
+        self.checked_at = 0.0
         
     def should_ignore(self, path: str) -> bool:
         ignore_patterns = {
@@ -21,14 +35,30 @@ class FileCompleter(Completer):
         )
 
     def is_binary(self, path: str) -> bool:
-        try:
-            with open(path, 'tr') as check:
-                check.read(1024)
-                return False
-        except:
-            return True
+        return self.classifier.is_binary(path)
 
     def get_files(self):
+        # A running capi serve already knows the text files; skip the walk
+        client = IndexClient.connect(self.prompt_dir)
+        if client is not None:
+            try:
+                snapshot = client.snapshot()
+                return [f for f in snapshot.files if snapshot.is_text_file(f)]
+            except (OSError, ValueError, RuntimeError, ConnectionError):
+                pass
+            finally:
+                client.close()
+
+        # In a git checkout the index already has the file list
+        git_files = list_git_files(self.prompt_dir)
+        if git_files is not None:
+            return sorted(
+                rel_path for rel_path in git_files
+                if not self.should_ignore(rel_path)
+                and os.path.isfile(os.path.join(self.prompt_dir, rel_path))
+                and not self.is_binary(os.path.join(self.prompt_dir, rel_path))
+            )
+
         files = []
         for prompt, _, filenames in os.walk(self.prompt_dir):
             for filename in filenames:
@@ -39,6 +69,46 @@ class FileCompleter(Completer):
                     files.append(rel_path)
         return sorted(files)
 
+    def stat_dirs(self, files):
+        """mtime_ns of every directory holding the files; it changes when entries are added or removed"""
+        dirs = {''}
+        for rel_path in files:
+            rel_dir = os.path.dirname(rel_path)
+            while rel_dir not in dirs:
+                dirs.add(rel_dir)
+                rel_dir = os.path.dirname(rel_dir)
+        mtimes = {}
+        for rel_dir in dirs:
+            try:
+                mtimes[rel_dir] = os.stat(os.path.join(self.prompt_dir, rel_dir)).st_mtime_ns
+            except OSError:
+                mtimes[rel_dir] = None
+        return mtimes
+
+    def is_stale(self):
+        """Whether a directory changed since the index was built, checked at most every REFRESH_INTERVAL"""
+        now = time.monotonic()
+        if now - self.checked_at < REFRESH_INTERVAL:
+            return False
+        self.checked_at = now
+        for rel_dir, mtime in self.dir_mtimes.items():
+            try:
+                current = os.stat(os.path.join(self.prompt_dir, rel_dir)).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                return True
+        return False
+
+    def get_index(self):
+        """The file index, rebuilt only when the project's directories have changed"""
+        if self.index is None or self.is_stale():
+            files = self.get_files()
+            self.index = PathIndex(files)
+            self.dir_mtimes = self.stat_dirs(files)
+            self.checked_at = time.monotonic()
+        return self.index
+
     def get_completions(self, document, complete_event):
         text = document.text.lower()
         
@@ -49,11 +119,11 @@ class FileCompleter(Completer):
         # Get the actual file part after 'file '
         word = text[5:]
         
-        for file_path in self.get_files():
-            filename = os.path.basename(file_path)
-            if word in filename.lower():
-                yield Completion(
-                    file_path,
-                    start_position=-len(word),
-                    display=file_path
-                )
\ No newline at end of file
+        index = self.get_index()
+        matches = index.search(word, MAX_COMPLETIONS) if word else index.paths[:MAX_COMPLETIONS]
+        for file_path in matches:
+            yield Completion(
+                file_path,
+                start_position=-len(word),
+                display=file_path
+            )
\ No newline at end of file
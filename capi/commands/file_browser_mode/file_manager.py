@@ -3,6 +3,7 @@ from prompt_toolkit.formatted_text import HTML
 from .file_completer import FileCompleter
 import pyperclip
 from ...utils.file_utils import get_file_contents
+from ...utils.large_files import parse_line_range
 from ..session_manager import SessionManager
 
 class FileManager:
@@ -28,7 +29,7 @@ class FileManager:
         if is_designer_mode:
             print("🟣 Prompt Designer Session Active - type 'paste' when you're done")
         print("Commands: file <filename>, copy, paste" if is_designer_mode else "Commands: file <filename>, copy")
-        print("Type part of a filename to search, use TAB to complete")
+        print("Type part of a filename to search, use TAB to complete; add :start-end for a line range")
         
         session = PromptSession(
             HTML("<ansiyellow>browser></ansiyellow> "),
@@ -70,7 +71,12 @@ class FileManager:
                     continue
 
                 file_path = result[5:].strip()
-                content = get_file_contents(file_path)
+                try:
+                    path, line_range = parse_line_range(file_path)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                    continue
+                content = get_file_contents(path, line_range)
                 
                 if content:
                     self.collected_files.append((file_path, content))
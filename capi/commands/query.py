@@ -1,13 +1,13 @@
 from typing import Optional
 import os
 import click
-import pyperclip
-from dotenv import load_dotenv
-from ..utils.clipboard_utils import get_clipboard_content
-from ..commands.agent_systems.workflow_processor import execute_workflow
 
 def handle_query(query, questions, verbose, paste):
     """Handle complex query workflow using multiple agents"""
+    # Imported here so that loading this module does not pull in the OpenAI client stack
+    from dotenv import load_dotenv
+    from ..commands.agent_systems.workflow_processor import execute_workflow
+
     # Load environment variables from .env file if it exists
     load_dotenv()
     
@@ -16,6 +16,7 @@ def handle_query(query, questions, verbose, paste):
         os.environ["VERBOSE"] = "1"
     
     if paste:
+        import pyperclip
         query = pyperclip.paste()
     
     if not query:
@@ -0,0 +1,240 @@
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+import click
+from ..utils.content_cache import ContentCache, stat_key
+from ..utils.file_reader import _read, _sliced
+from ..utils.index_client import IndexClient, recv_message, send_message, socket_path
+from ..utils.large_files import SizePolicy, parse_line_range, slice_lines
+from ..utils.snapshot import ProjectSnapshot
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_MAX_CACHED_BYTES = 128 * 1024 * 1024
+
+class ProjectIndex:
+    """Live project snapshot plus an in-memory LRU of recently read files.
+
+    A poller thread stats every indexed directory (and every .gitignore) and
+    rebuilds the snapshot when any of their mtimes change. File contents are
+    re-validated against (size, mtime_ns, inode) on every read.
+    """
+
+    def __init__(self, root, poll_interval=DEFAULT_POLL_INTERVAL, max_cached_bytes=DEFAULT_MAX_CACHED_BYTES):
+        self.root = root
+        self.real_root = os.path.realpath(root)
+        self.poll_interval = poll_interval
+        self.max_cached_bytes = max_cached_bytes
+        self.lock = threading.RLock()
+        self.contents = OrderedDict()  # rel_path -> (key, text, size, digest)
+        self.cached_bytes = 0
+        self.rebuilds = 0
+        self.stopped = threading.Event()
+        self.rebuild()
+
+    def rebuild(self):
+        cache = ContentCache.open(self.root)
+        try:
+            snapshot = ProjectSnapshot.scan(self.root, cache=cache)
+        finally:
+            if cache:
+                cache.close()
+        watched = self._watch_targets(snapshot)
+        with self.lock:
+            self.snapshot = snapshot
+            self.snapshot_json = json.dumps({"snapshot": snapshot.to_dict()})
+            self.watched = watched
+            self.rebuilds += 1
+
+    def _watch_targets(self, snapshot):
+        targets = {}
+        for rel_dir in [''] + snapshot.dirs:
+            full_dir = snapshot.full_path(rel_dir) if rel_dir else snapshot.root
+            for path in (full_dir, os.path.join(full_dir, '.gitignore')):
+                try:
+                    targets[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    targets[path] = None
+        return targets
+
+    def changed(self):
+        for path, mtime_ns in self.watched.items():
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime_ns:
+                return True
+        return False
+
+    def poll_forever(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                if self.changed():
+                    self.rebuild()
+            except Exception as e:
+                print(f"Error refreshing index: {e}", file=sys.stderr)
+
+    def read(self, spec, policy=None):
+        rel_path, line_range = parse_line_range(spec)
+        full_path = os.path.realpath(os.path.join(self.root, rel_path))
+        # Clients name files relative to the project; never serve anything outside it
+        if os.path.commonpath([self.real_root, full_path]) != self.real_root:
+            raise ValueError(f"Path is outside the project: {rel_path}")
+        key = stat_key(full_path)
+        if key is None:
+            return {"text": None}
+        if policy is not None and policy.applies_to(key[0]) and line_range is None:
+            text, size, digest = _read(full_path, policy)
+            return {"text": text, "size": size, "digest": digest}
+
+        with self.lock:
+            entry = self.contents.get(rel_path)
+            if entry is not None and entry[0] == key:
+                self.contents.move_to_end(rel_path)
+        if entry is None or entry[0] != key:
+            text, size, digest = _read(full_path)
+            if text is None:
+                return {"text": None}
+            entry = (key, text, size, digest)
+            self._remember(rel_path, entry)
+
+        _, text, size, digest = entry
+        if line_range is not None:
+            text, size, digest = _sliced(slice_lines(text, line_range))
+        return {"text": text, "size": size, "digest": digest}
+
+    def _remember(self, rel_path, entry):
+        with self.lock:
+            old = self.contents.pop(rel_path, None)
+            if old is not None:
+                self.cached_bytes -= old[2]
+            self.contents[rel_path] = entry
+            self.cached_bytes += entry[2]
+            while self.cached_bytes > self.max_cached_bytes and len(self.contents) > 1:
+                _, evicted = self.contents.popitem(last=False)
+                self.cached_bytes -= evicted[2]
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        index = self.server.index
+        while True:
+            try:
+                message = recv_message(self.rfile)
+            except ValueError:
+                break
+            if message is None:
+                break
+            op = message.get("op")
+            try:
+                if op == "snapshot":
+                    with index.lock:
+                        payload = index.snapshot_json
+                    self.wfile.write(payload.encode() + b"\n")
+                    self.wfile.flush()
+                    continue
+                elif op == "read":
+                    policy = message.get("policy")
+                    response = index.read(message["path"], SizePolicy(**policy) if policy else None)
+                elif op == "ping":
+                    response = {"root": index.root, "files": len(index.snapshot.files),
+                                "rebuilds": index.rebuilds, "cached_files": len(index.contents)}
+                elif op == "shutdown":
+                    send_message(self.wfile, {"ok": True})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    break
+                else:
+                    response = {"error": f"Unknown op: {op}"}
+            except Exception as e:
+                response = {"error": str(e)}
+            send_message(self.wfile, response)
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def _spawn_detached(src, poll_interval):
+    log_path = os.path.splitext(socket_path(src))[0] + ".log"
+    with open(log_path, 'a') as log:
+        subprocess.Popen(
+            [sys.executable, '-c', 'from capi.cli import main; main()',
+             'serve', '--src', src, '--poll-interval', str(poll_interval)],
+            stdout=log, stderr=log, stdin=subprocess.DEVNULL, start_new_session=True
+        )
+    # Wait briefly so the next command can already use the daemon
+    for _ in range(100):
+        client = IndexClient.connect(src)
+        if client is not None:
+            client.close()
+            click.echo(f"capi serve started in the background (log: {log_path})")
+            return
+        time.sleep(0.1)
+    click.echo(f"capi serve did not come up yet; check {log_path}", err=True)
+
+def serve_project(src, poll_interval=DEFAULT_POLL_INTERVAL, detach=False, stop=False, status=False):
+    """Run (or control) the warm index daemon for a project."""
+    if src == '.':
+        src = os.getcwd()
+    src = os.path.abspath(src)
+
+    if not hasattr(socketserver, 'UnixStreamServer'):
+        click.secho("capi serve needs Unix domain sockets, which this platform does not provide.", fg='red')
+        return
+    try:
+        path = socket_path(src)
+    except OSError as e:
+        click.secho(f"capi serve cannot use its socket directory: {e}", fg='red')
+        return
+
+    client = IndexClient.connect(src)
+    if stop or status:
+        if client is None:
+            click.echo("No capi serve daemon is running for this project.")
+            return
+        try:
+            if stop:
+                client.request("shutdown")
+                click.echo("capi serve stopped.")
+            else:
+                info = client.request("ping")
+                click.echo(f"Serving {info['root']}: {info['files']} files indexed, "
+                           f"{info['rebuilds']} rebuilds, {info['cached_files']} files in memory")
+        finally:
+            client.close()
+        return
+
+    if client is not None:
+        client.close()
+        click.echo("capi serve is already running for this project.")
+        return
+
+    if detach:
+        _spawn_detached(src, poll_interval)
+        return
+
+    if os.path.exists(path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.unlink(path)
+
+    start = time.perf_counter()
+    index = ProjectIndex(src, poll_interval)
+    click.echo(f"Indexed {len(index.snapshot.files)} files in {time.perf_counter() - start:.2f}s")
+
+    server = _Server(path, _Handler)
+    server.index = index
+    poller = threading.Thread(target=index.poll_forever, daemon=True)
+    poller.start()
+    click.echo(f"capi serve listening on {path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        index.stopped.set()
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        click.echo("capi serve stopped.")
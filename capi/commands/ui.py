@@ -2,20 +2,38 @@ import tkinter as tk
 from tkinter import ttk
 from pathlib import Path
 import os
-import json
-import pyperclip
-from ..utils.file_utils import (
-    get_gitignore_patterns,
-    get_file_contents,
-    is_binary_file,
-    should_ignore
-)
+import queue
+import threading
+from bisect import bisect_left
+from functools import partial
+from ..utils.content_cache import ContentCache
+from ..utils.file_reader import ParallelFileReader
+from ..utils.index_client import load_snapshot
+from ..utils.large_files import format_line_range, parse_line_range
+from ..utils.pack_writer import PackWriter, write_files
+from ..utils.path_index import PathIndex
+from ..utils.selection import save_selection
+from ..utils.snapshot import DirListing, FileInfo, ProjectSnapshot
 from ..utils.structure_utils import generate_directory_structure
+from ..utils.token_budget import (DEFAULT_PRIORITY, TokenBudget, block_overhead, estimate_tokens,
+                                  warning_thresholds)
+
+# Files shown when searching by relevance
+RELEVANCE_TOP = 30
+# Quiet period after the last keystroke before the tree is filtered
+SEARCH_DELAY_MS = 150
+# How often the UI picks up files from the background scan, and at most how many per turn
+SCAN_POLL_MS = 50
+SCAN_BATCH = 5000
 
 class FileTreeView:
-    def __init__(self, prompt_dir, include_structure=1):
+    def __init__(self, prompt_dir, include_structure=1, budget=None, priority=DEFAULT_PRIORITY,
+                 minify=False, outline=False, full=(), deps=1, target=None):
         self.prompt_dir = os.path.abspath(prompt_dir)
         self.include_structure = include_structure
+        self.priority = priority
+        self.scan_status = ""  # Progress of the background scan, shown in the status label
+        self.meter_label = None  # Size meter under the selection, created with the selection panel
         self.window = tk.Tk()
         self.window.title("Select Files")
         
@@ -30,6 +48,8 @@ class FileTreeView:
         # Create checkboxes
         self.include_structure_var = tk.BooleanVar(value=True)
         self.include_context_var = tk.BooleanVar(value=True)
+        self.minify_var = tk.BooleanVar(value=minify)
+        self.outline_var = tk.BooleanVar(value=outline)
         
         structure_cb = ttk.Checkbutton(
             checkbox_frame, 
@@ -44,8 +64,51 @@ class FileTreeView:
             command=self.update_status
         )
         
+        minify_cb = ttk.Checkbutton(
+            checkbox_frame, 
+            text="Minify",
+            variable=self.minify_var,
+            command=self.update_status
+        )
+        
         structure_cb.pack(side=tk.LEFT, padx=5)
         context_cb.pack(side=tk.LEFT, padx=5)
+        minify_cb.pack(side=tk.LEFT, padx=5)
+        
+        # Outline mode, with glob patterns for files that stay in full
+        outline_frame = ttk.Frame(main_frame)
+        outline_frame.pack(fill=tk.X, pady=(0, 5))
+        outline_cb = ttk.Checkbutton(
+            outline_frame,
+            text="Outline only",
+            variable=self.outline_var,
+            command=self.update_status
+        )
+        outline_cb.pack(side=tk.LEFT, padx=5)
+        full_label = ttk.Label(outline_frame, text="Full content for:")
+        full_label.pack(side=tk.LEFT, padx=(10, 0))
+        self.full_var = tk.StringVar(value=", ".join(full))
+        full_entry = ttk.Entry(outline_frame, textvariable=self.full_var)
+        full_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Expand the selection with the files it imports
+        deps_frame = ttk.Frame(main_frame)
+        deps_frame.pack(fill=tk.X, pady=(0, 5))
+        deps_button = ttk.Button(deps_frame, text="Add imports", command=self.add_imports)
+        deps_button.pack(side=tk.LEFT, padx=5)
+        deps_label = ttk.Label(deps_frame, text="Depth:")
+        deps_label.pack(side=tk.LEFT, padx=(10, 0))
+        self.deps_var = tk.StringVar(value=str(deps))
+        deps_spinbox = ttk.Spinbox(deps_frame, from_=1, to=10, textvariable=self.deps_var, width=4)
+        deps_spinbox.pack(side=tk.LEFT, padx=5)
+        
+        # Create token budget entry (empty means no budget)
+        self.budget_var = tk.StringVar(value=str(budget) if budget else "")
+        self.budget_var.trace('w', lambda *args: self.update_meter())
+        budget_entry = ttk.Entry(checkbox_frame, textvariable=self.budget_var, width=8)
+        budget_entry.pack(side=tk.RIGHT, padx=5)
+        budget_label = ttk.Label(checkbox_frame, text="Token budget:")
+        budget_label.pack(side=tk.RIGHT)
         
         # Add status label
         self.status_label = ttk.Label(main_frame, text="")
@@ -59,26 +122,49 @@ class FileTreeView:
         
         # Create search entry
         self.search_var = tk.StringVar()
-        self.search_var.trace('w', lambda *args: self.after_search_change())
+        self.search_var.trace('w', lambda *args: self.schedule_search())
+        self.search_job = None
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
         # Create clear button
         clear_button = ttk.Button(search_frame, text="Clear", command=self.clear_search)
         clear_button.pack(side=tk.RIGHT, padx=(5, 0))
+
+        # Rank files by content instead of matching paths
+        self.relevance_var = tk.BooleanVar(value=False)
+        relevance_cb = ttk.Checkbutton(
+            search_frame, text="Relevance", variable=self.relevance_var,
+            command=self.after_search_change
+        )
+        relevance_cb.pack(side=tk.RIGHT, padx=(5, 0))
         
         # Create selection display frame
         selection_frame = ttk.Frame(main_frame)
         selection_frame.pack(fill=tk.X, pady=(0, 10))
         
         # Create selection label
-        selection_label = ttk.Label(selection_frame, text="Selected files:")
+        selection_label = ttk.Label(selection_frame, text="Selected files (append :start-end to copy only those lines):")
         selection_label.pack(anchor=tk.W)
         
         # Create selection text widget
         self.selection_text = tk.Text(selection_frame, height=3, wrap=tk.WORD)
         self.selection_text.pack(fill=tk.X)
-        self.selection_text.configure(state='disabled')
+        self.line_ranges = {}  # Optional (start, end) line range per selected path
+        
+        # Running size of the selection, with a warning threshold per target model
+        meter_frame = ttk.Frame(selection_frame)
+        meter_frame.pack(fill=tk.X, pady=(5, 0))
+        self.meter_label = ttk.Label(meter_frame, text="")
+        self.meter_label.pack(side=tk.LEFT)
+        self.thresholds = warning_thresholds(os.path.join(self.prompt_dir, 'prompting', 'cli', 'agents.json'))
+        self.target_var = tk.StringVar(value=target or "")
+        target_box = ttk.Combobox(meter_frame, textvariable=self.target_var, values=sorted(self.thresholds),
+                                  state='readonly', width=14)
+        target_box.pack(side=tk.RIGHT)
+        target_box.bind('<<ComboboxSelected>>', lambda event: self.update_meter())
+        target_label = ttk.Label(meter_frame, text="Warn for:")
+        target_label.pack(side=tk.RIGHT, padx=(5, 2))
         
         # Create treeview with scrollbar
         tree_frame = ttk.Frame(main_frame)
@@ -108,143 +194,308 @@ class FileTreeView:
         status_label = ttk.Label(main_frame, text=status_text)
         status_label.pack(pady=5)
         
-        # Get ignore patterns
-        self.ignore_patterns = get_gitignore_patterns(self.prompt_dir)
-        self.always_ignore = ['venv', '__pycache__', '.git', 'node_modules', '.gitignore', 'capi.egg-info']
+        # Project snapshot shared by the tree, search and structure output
+        self.snapshot = None
+        self.relevance = None  # BM25 index, opened on the first relevance search
         
         # Initialize selected items tracking
         self.selected_paths = set()  # Store paths instead of tree items
-        self.file_paths = {}  # Store file paths for quick search
+        self.selected_bytes = 0  # Meter totals, kept in step with selected_paths
+        self.selected_tokens = 0
+        self.structure_tokens = None  # Estimated once the scan is done
+        self.context_tokens = None  # Estimated from ctx.xml on first use
+        self.item_paths = {}  # Tree item -> project-relative path ('' for the root)
+        self.path_items = {}  # Project-relative path -> tree item
+        self.unexpanded = set()  # Directory items whose children are not inserted yet
+        self.filtered = False  # Whether the tree shows search results rather than the project
+        self.path_index = None  # Fuzzy path search over the text files, rebuilt when missing
+        self.scan_queue = queue.Queue()  # FileInfo per scanned file, then the snapshot or an error
+        self.scan_thread = None
         
         # Store all valid files and directories
         self.all_files = []
         self.all_dirs = []
         
-        # Bind click event
+        # Bind click and expand events
         self.tree.bind('<ButtonRelease-1>', self.on_click)
+        self.tree.bind('<<TreeviewOpen>>', self.on_open)
         
-        # Cache files and populate tree
-        self.cache_files()
-        self.populate_tree()
+        # Scan in the background; the tree fills in as files are found
+        self.start_scan()
         
         # Set window size
         self.window.geometry("450x700")
 
     def cache_files(self):
         """Cache all valid files and directories"""
-        self.all_files = []
-        self.all_dirs = []
-        for prompt, dirs, files in os.walk(self.prompt_dir):
-            rel_prompt = os.path.relpath(prompt, self.prompt_dir)
-            
-            # Filter directories
-            filtered_dirs = []
-            for d in dirs:
-                dir_path = os.path.join(rel_prompt, d)
-                if not should_ignore(dir_path, self.ignore_patterns + self.always_ignore):
-                    filtered_dirs.append(d)
-                    if dir_path != '.':
-                        self.all_dirs.append(dir_path)
-            dirs[:] = filtered_dirs
-            
-            # Filter files
-            for f in files:
-                file_path = os.path.join(rel_prompt, f)
-                full_path = os.path.join(prompt, f)
-                if not should_ignore(file_path, self.ignore_patterns + self.always_ignore):
-                    if not is_binary_file(full_path):
-                        self.all_files.append(file_path)
+        cache = ContentCache.open(self.prompt_dir)
+        try:
+            self.set_snapshot(load_snapshot(self.prompt_dir, cache=cache))
+        finally:
+            if cache:
+                cache.close()
+
+    def set_snapshot(self, snapshot):
+        """Use ``snapshot`` for the tree, search and output"""
+        self.snapshot = snapshot
+        self.all_files = self.snapshot.files
+        self.all_dirs = self.snapshot.dirs
+        self.path_index = PathIndex(self.all_files)
+
+    def start_scan(self):
+        """Scan the project on a worker thread, starting from an empty tree"""
+        self.set_snapshot(ProjectSnapshot(root=self.prompt_dir, matcher=None, tree={'': DirListing()}))
+        self.populate_tree()
+        self.scan_status = "Scanning..."
+        self.update_status()
+        self.scan_thread = threading.Thread(target=self.scan_worker, daemon=True)
+        self.scan_thread.start()
+        self.window.after(SCAN_POLL_MS, self.drain_scan_queue)
+
+    def scan_worker(self):
+        """Runs on the scan thread; talks to the UI only through the queue"""
+        try:
+            cache = ContentCache.open(self.prompt_dir)
+            try:
+                result = load_snapshot(self.prompt_dir, cache=cache, progress=self.scan_queue.put)
+            finally:
+                if cache:
+                    cache.close()
+        except Exception as e:
+            result = e
+        self.scan_queue.put(result)
+
+    def drain_scan_queue(self, limit=SCAN_BATCH):
+        """Add files found by the scan so far; ``limit=None`` takes everything queued"""
+        if self.scan_thread is None:
+            return
+        taken = 0
+        while limit is None or taken < limit:
+            try:
+                entry = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(entry, FileInfo):
+                self.finish_scan(entry)
+                return
+            self.add_scanned_file(entry)
+            taken += 1
+        self.scan_status = f"Scanning... {len(self.snapshot.meta)} files"
+        self.update_status()
+        self.window.after(SCAN_POLL_MS, self.drain_scan_queue)
+
+    def wait_for_scan(self):
+        """Block until the scan is done, so output uses the complete snapshot"""
+        if self.scan_thread is not None:
+            self.scan_thread.join()
+            self.drain_scan_queue(limit=None)
+
+    def add_scanned_file(self, info):
+        """Record a file from the scan in the provisional snapshot, and show it if its directory is open"""
+        rel_dir, _, name = info.rel_path.rpartition('/')
+        self.add_scanned_dir(rel_dir)
+        self.snapshot.meta[info.rel_path] = info
+        listing = self.snapshot.tree[rel_dir]
+        position = bisect_left(listing.files, name)
+        listing.files.insert(position, name)
+        if info.is_binary:
+            return
+        self.snapshot.files.append(info.rel_path)
+        self.path_index = None
+        # A walk yields each directory's files in order, but git lists untracked and tracked
+        # files separately, so a file may belong before siblings that are already shown
+        index = 'end'
+        if position < len(listing.files) - 1:
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            index = len(listing.dirs) + sum(1 for other in listing.files[:position]
+                                            if self.snapshot.is_text_file(prefix + other))
+        self.show_scanned(rel_dir, name, info.rel_path, False, index)
+
+    def add_scanned_dir(self, rel_dir):
+        """Register ``rel_dir`` and its parents in the provisional snapshot"""
+        if rel_dir in self.snapshot.tree:
+            return
+        parent, _, name = rel_dir.rpartition('/')
+        self.add_scanned_dir(parent)
+        self.snapshot.tree[rel_dir] = DirListing()
+        self.snapshot.dirs.append(rel_dir)
+        dirs = self.snapshot.tree[parent].dirs
+        index = bisect_left(dirs, name)
+        dirs.insert(index, name)
+        # Directories come first, so their position among the children is known
+        self.show_scanned(parent, name, rel_dir, True, index)
+
+    def show_scanned(self, parent, name, rel_path, is_dir, index):
+        """Insert a scanned entry under ``parent`` if that directory is already filled in"""
+        if self.filtered:
+            return
+        parent_item = self.path_items.get(parent)
+        if parent_item is None or parent_item in self.unexpanded:
+            return
+        self.add_item(parent_item, name, rel_path, is_dir, lazy=is_dir, index=index)
+
+    def finish_scan(self, result):
+        """Swap in the complete snapshot and bring the tree in line with it"""
+        self.scan_thread = None
+        if isinstance(result, Exception):
+            print(f"Error scanning project: {result}")
+            self.scan_status = "Scan failed"
+            self.update_status()
+            return
+        self.set_snapshot(result)
+        self.recount_selection()
+        self.structure_tokens = estimate_tokens(generate_directory_structure(self.prompt_dir, self.snapshot))
+        if self.relevance is not None:
+            # Built from a partial file list; refreshed on the next relevance search
+            self.relevance.close()
+            self.relevance = None
+        self.scan_status = ""
+        self.update_status()
+        if self.filtered:
+            # Matches found after the search ran are only in the new snapshot
+            self.after_search_change()
+            return
+        for item, rel_dir in list(self.item_paths.items()):
+            if rel_dir in self.snapshot.tree and item not in self.unexpanded:
+                self.sync_directory(item, rel_dir)
+
+    def sync_directory(self, parent_item, rel_dir):
+        """Order the children of an open directory as in the snapshot, adding any missing ones"""
+        listing = self.snapshot.tree[rel_dir]
+        children = [(name, True) for name in listing.dirs]
+        children += [(name, False) for name in listing.files]
+        index = 0
+        for name, is_dir in children:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if not is_dir and not self.snapshot.is_text_file(rel_path):
+                continue
+            item = self.path_items.get(rel_path)
+            if item is None:
+                self.add_item(parent_item, name, rel_path, is_dir, lazy=is_dir, index=index)
+            else:
+                self.tree.move(item, parent_item, index)
+            index += 1
 
     def clear_search(self):
         """Clear the search bar and reset the tree view"""
         self.search_var.set('')
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+            self.search_job = None
         self.populate_tree()
 
+    def schedule_search(self):
+        """Filter once typing pauses, instead of on every keystroke"""
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(SEARCH_DELAY_MS, self.after_search_change)
+
     def after_search_change(self):
-        """Handle search input changes with delay to prevent crashes"""
+        """Filter the tree for the current search text"""
+        self.search_job = None
         search_text = self.search_var.get().lower()
-        self.filter_tree(search_text)
+        self.filter_tree(search_text, relevance=self.relevance_var.get())
 
-    def filter_tree(self, search_text):
-        """Filter tree items based on search text"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+    def relevant_files(self, query):
+        """Files ranked for ``query`` by the BM25 index, refreshed on first use"""
+        if self.relevance is None:
+            from ..utils.relevance import RelevanceIndex
+            self.relevance = RelevanceIndex(self.prompt_dir)
+            cache = ContentCache.open(self.prompt_dir)
+            try:
+                reader = ParallelFileReader(self.prompt_dir, cache=cache, meta=self.snapshot.meta,
+                                            remote=self.snapshot.remote)
+                self.relevance.update(reader.key, self.all_files, reader.read)
+            finally:
+                if cache:
+                    cache.close()
+        return [path for path, _ in self.relevance.search(query, RELEVANCE_TOP)]
+
+    def filter_tree(self, search_text, relevance=False):
+        """Show only files matching the search text, or the most relevant ones by content"""
         if not search_text:
             self.populate_tree()
             return
-        
-        # Find matching files and their parent directories
-        matched_paths = set()
-        
-        # Search in cached files
-        for file_path in self.all_files:
-            if search_text in file_path.lower():
-                matched_paths.add(file_path)
-                # Add all parent directories
-                current_dir = os.path.dirname(file_path)
-                while current_dir:
-                    matched_paths.add(current_dir)
-                    current_dir = os.path.dirname(current_dir)
-        
-        # Add prompt if we have matches
-        if matched_paths:
-            prompt_item = self.add_item('', os.path.basename(self.prompt_dir), self.prompt_dir, True)
-            self.add_filtered_contents(prompt_item, self.prompt_dir, matched_paths)
-            
-            # Expand all items
-            for item in self.get_all_children(prompt_item):
-                self.tree.item(item, open=True)
+        if relevance:
+            matched_files = self.relevant_files(search_text)
+        else:
+            if self.path_index is None:
+                self.path_index = PathIndex(self.all_files)
+            matched_files = self.path_index.search(search_text)
+        
+        # Matching files and all their parent directories
+        shown = {''}
+        for file_path in matched_files:
+            shown.add(file_path)
+            current_dir = os.path.dirname(file_path)
+            while current_dir not in shown:
+                shown.add(current_dir)
+                current_dir = os.path.dirname(current_dir)
+        
+        if not self.filtered:
+            self.clear_tree()
+            self.filtered = True
+        self.update_filtered_tree(shown if matched_files else set())
 
-    def add_filtered_contents(self, parent_item, parent_path, matched_paths):
-        """Add filtered directory contents to the tree"""
-        try:
-            # Add matching directories
-            dirs = []
-            files = []
-            
-            for item in sorted(os.listdir(parent_path)):
-                item_path = os.path.join(parent_path, item)
-                rel_path = os.path.relpath(item_path, self.prompt_dir)
-                
-                if should_ignore(rel_path, self.ignore_patterns + self.always_ignore):
-                    continue
-                    
-                if os.path.isdir(item_path):
-                    if rel_path in matched_paths:
-                        dirs.append((item, item_path))
-                elif os.path.isfile(item_path) and not is_binary_file(item_path):
-                    if rel_path in matched_paths:
-                        files.append((item, item_path))
-            
-            # Add directories first
-            for name, dir_path in dirs:
-                dir_item = self.add_item(parent_item, name, dir_path, True)
-                self.add_filtered_contents(dir_item, dir_path, matched_paths)
-            
-            # Then add files
-            for name, file_path in files:
-                file_item = self.add_item(parent_item, name, file_path, False)
-                rel_path = os.path.relpath(file_path, self.prompt_dir)
-                
-                # Apply appropriate tags
-                tags = []
-                if rel_path in self.selected_paths:
-                    tags.append('selected')
-                if rel_path in matched_paths:
-                    tags.append('match')
-                if tags:
-                    self.tree.item(file_item, tags=tuple(tags))
-                    
-        except Exception as e:
-            print(f"Error accessing {parent_path}: {e}")
+    def update_filtered_tree(self, shown):
+        """Bring the tree in line with ``shown`` by removing and inserting only what changed"""
+        gone = [path for path in self.path_items if path not in shown]
+        for rel_path in gone:
+            item = self.path_items.pop(rel_path)
+            self.item_paths.pop(item, None)
+            # Descendants go with their parent, so only delete where the parent stays
+            parent = os.path.dirname(rel_path) if rel_path else None
+            if parent is None or parent in shown:
+                self.tree.delete(item)
+        if not shown:
+            return
+        if '' not in self.path_items:
+            self.add_item('', os.path.basename(self.prompt_dir), '', True)
+        self.add_filtered_contents(self.path_items[''], '', shown)
+
+    def add_filtered_contents(self, parent_item, rel_dir, shown):
+        """Insert the missing shown children of a directory, in tree order"""
+        listing = self.snapshot.tree.get(rel_dir)
+        if listing is None:
+            return
+        children = []
+        
+        # Directories first, then files
+        for name in listing.dirs:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if rel_path in shown:
+                children.append((name, rel_path, True))
+        for name in listing.files:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if rel_path in shown:
+                children.append((name, rel_path, False))
+        
+        for index, (name, rel_path, is_dir) in enumerate(children):
+            item = self.path_items.get(rel_path)
+            if item is None:
+                item = self.add_item(parent_item, name, rel_path, is_dir,
+                                     tags=() if is_dir else ('match',), index=index)
+            if is_dir:
+                self.add_filtered_contents(item, rel_path, shown)
 
-    def add_item(self, parent, text, item_path, is_dir=False):
-        """Add an item to the tree"""
-        item = self.tree.insert(parent, 'end', text=text, open=True)  # Always open directories
-        if not is_dir:
-            self.file_paths[item_path] = {'item': item, 'text': text}
+    def clear_tree(self):
+        """Remove all items and forget their paths"""
+        self.tree.delete(*self.tree.get_children())
+        self.item_paths.clear()
+        self.path_items.clear()
+        self.unexpanded.clear()
+
+    def add_item(self, parent, text, rel_path, is_dir=False, tags=(), lazy=False, index='end'):
+        """Add an item to the tree; ``lazy`` directories get their children when first opened"""
+        if rel_path in self.selected_paths:
+            tags = ('selected',) + tuple(tags)
+        item = self.tree.insert(parent, index, text=text, open=is_dir and not lazy, tags=tags)
+        self.item_paths[item] = rel_path
+        self.path_items[rel_path] = item
+        if lazy:
+            # Placeholder child so the directory shows an expand arrow
+            self.tree.insert(item, 'end', text='')
+            self.unexpanded.add(item)
         return item
 
     def get_all_children(self, item):
@@ -255,58 +506,44 @@ class FileTreeView:
             result.extend(self.get_all_children(child))
         return result
 
-    def add_directory_contents(self, parent_item, parent_path):
-        """Add directory contents to the tree"""
-        try:
-            items = os.listdir(parent_path)
-            
-            # Separate directories and files
-            dirs = []
-            files = []
-            for item in items:
-                item_path = os.path.join(parent_path, item)
-                rel_path = os.path.relpath(item_path, self.prompt_dir)
-                
-                if should_ignore(rel_path, self.ignore_patterns + self.always_ignore):
-                    continue
-                    
-                if os.path.isdir(item_path):
-                    dirs.append(item)
-                elif not is_binary_file(item_path):
-                    files.append(item)
-            
-            # Add directories first
-            for d in sorted(dirs):
-                dir_path = os.path.join(parent_path, d)
-                dir_item = self.add_item(parent_item, d, dir_path, True)
-                self.add_directory_contents(dir_item, dir_path)
-            
-            # Then add files
-            for f in sorted(files):
-                file_path = os.path.join(parent_path, f)
-                file_item = self.add_item(parent_item, f, file_path, False)
-                # Check if file is selected
-                rel_path = os.path.relpath(file_path, self.prompt_dir)
-                if rel_path in self.selected_paths:
-                    self.tree.item(file_item, tags=('selected',))
-                
-        except Exception as e:
-            print(f"Error accessing {parent_path}: {e}")
+    def add_directory_contents(self, parent_item, rel_dir):
+        """Add the direct children of a directory; subdirectories are filled in on expand"""
+        listing = self.snapshot.tree.get(rel_dir)
+        if listing is None:
+            return
+        
+        # Add directories first
+        for d in listing.dirs:
+            rel_path = f"{rel_dir}/{d}" if rel_dir else d
+            self.add_item(parent_item, d, rel_path, True, lazy=True)
+        
+        # Then add files
+        for f in listing.files:
+            rel_path = f"{rel_dir}/{f}" if rel_dir else f
+            if self.snapshot.is_text_file(rel_path):
+                self.add_item(parent_item, f, rel_path, False)
+
+    def expand_item(self, item):
+        """Insert the children of a lazily added directory"""
+        if item not in self.unexpanded:
+            return
+        self.unexpanded.discard(item)
+        self.tree.delete(*self.tree.get_children(item))
+        self.add_directory_contents(item, self.item_paths[item])
+
+    def on_open(self, event):
+        """Fill in a directory when it is expanded"""
+        self.expand_item(self.tree.focus())
 
     def populate_tree(self):
-        """Populate the tree with the directory structure"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Populate the tree with the top level of the project from the snapshot"""
+        self.clear_tree()
+        self.filtered = False
         
         # Add prompt directory
         prompt_name = os.path.basename(self.prompt_dir)
-        prompt_item = self.add_item('', prompt_name, self.prompt_dir, True)
-        
-        self.add_directory_contents(prompt_item, self.prompt_dir)
-        
-        # Expand all items
-        for item in self.get_all_children(prompt_item):
-            self.tree.item(item, open=True)
+        prompt_item = self.add_item('', prompt_name, '', True)
+        self.add_directory_contents(prompt_item, '')
 
     def on_click(self, event):
         """Handle item clicks"""
@@ -315,29 +552,108 @@ class FileTreeView:
             self.tree.selection_remove(self.tree.selection())
             self.toggle_select(item)
 
+    def sync_line_ranges(self):
+        """Pick up path:start-end ranges typed into the selection text widget"""
+        for line in self.selection_text.get(1.0, tk.END).splitlines():
+            try:
+                path, line_range = parse_line_range(line)
+            except ValueError as e:
+                print(e)
+                continue
+            if path in self.selected_paths:
+                if line_range:
+                    self.line_ranges[path] = line_range
+                else:
+                    self.line_ranges.pop(path, None)
+
     def update_selection_display(self):
         """Update the selection text widget with currently selected files"""
-        self.selection_text.configure(state='normal')
+        self.sync_line_ranges()
         self.selection_text.delete(1.0, tk.END)
-        selected_files = sorted(self.selected_paths)
+        selected_files = self.get_selected_files(sync=False)
         if selected_files:
             self.selection_text.insert(tk.END, '\n'.join(selected_files))
-        self.selection_text.configure(state='disabled')
 
     def toggle_select(self, item):
         """Toggle selection state of an item"""
-        item_path = self.get_item_path(item)
-        rel_path = os.path.relpath(item_path, self.prompt_dir)
+        rel_path = self.item_paths.get(item)
         
-        if os.path.isfile(item_path):
-            if rel_path in self.selected_paths:
-                self.selected_paths.remove(rel_path)
-                self.tree.item(item, tags=())
-            else:
-                self.selected_paths.add(rel_path)
-                self.tree.item(item, tags=('selected',))
+        if rel_path in self.snapshot.meta:
+            self.set_selected(rel_path, rel_path not in self.selected_paths)
+            self.update_item_tags(rel_path)
         
         self.update_selection_display()
+        self.update_meter()
+
+    def file_tokens(self, rel_path):
+        """Estimated tokens a file adds to the pack, fence included"""
+        return self.snapshot.meta[rel_path].estimated_tokens + block_overhead(rel_path)
+
+    def set_selected(self, rel_path, selected):
+        """Select or deselect one file, adjusting the meter totals by that file alone"""
+        if (rel_path in self.selected_paths) == selected:
+            return
+        sign = 1 if selected else -1
+        if selected:
+            self.selected_paths.add(rel_path)
+        else:
+            self.selected_paths.remove(rel_path)
+            self.line_ranges.pop(rel_path, None)
+        self.selected_bytes += sign * self.snapshot.meta[rel_path].size
+        self.selected_tokens += sign * self.file_tokens(rel_path)
+
+    def recount_selection(self):
+        """Recompute the meter totals, for when the snapshot behind them is replaced"""
+        self.selected_paths &= self.snapshot.meta.keys()
+        self.selected_bytes = sum(self.snapshot.meta[path].size for path in self.selected_paths)
+        self.selected_tokens = sum(self.file_tokens(path) for path in self.selected_paths)
+
+    def get_context_tokens(self):
+        """Estimated tokens of ctx.xml, read once"""
+        if self.context_tokens is None:
+            ctx_path = Path(self.prompt_dir) / 'prompting' / 'cli' / 'ctx.xml'
+            try:
+                self.context_tokens = estimate_tokens(ctx_path.read_text(encoding='utf-8'))
+            except (OSError, UnicodeDecodeError):
+                self.context_tokens = 0
+        return self.context_tokens
+
+    def get_warning_threshold(self):
+        """Token count to warn above: the chosen model's threshold, else the token budget"""
+        target = self.target_var.get()
+        if target in self.thresholds:
+            return self.thresholds[target]
+        value = self.budget_var.get().strip()
+        return int(value) if value.isdigit() else None
+
+    def update_meter(self):
+        """Show the selection's size and estimated tokens, in red past the warning threshold"""
+        if self.meter_label is None:
+            return
+        overhead = 0
+        if self.include_structure_var.get():
+            overhead += self.structure_tokens or 0
+        if self.include_context_var.get():
+            overhead += self.get_context_tokens()
+        total = self.selected_tokens + overhead
+        text = (f"{len(self.selected_paths)} files, {self.selected_bytes / 1024:,.1f} KB, "
+                f"~{total:,} tokens")
+        if overhead:
+            text += f" ({overhead:,} structure/context)"
+        limit = self.get_warning_threshold()
+        if limit is not None:
+            text += f" of {limit:,}"
+        self.meter_label.config(text=text, foreground='red' if limit is not None and total > limit else '')
+
+    def update_item_tags(self, rel_path):
+        """Mark a path's item as selected or not, if it is currently in the tree"""
+        item = self.path_items.get(rel_path)
+        if item is None:
+            return
+        tags = tuple(t for t in self.tree.item(item, 'tags') if t != 'selected')
+        if rel_path in self.selected_paths:
+            tags = ('selected',) + tags
+        self.tree.item(item, tags=tags)
 
     def select_item(self, item):
         """Select an item and all its children"""
@@ -357,15 +673,52 @@ class FileTreeView:
 
     def get_item_path(self, item):
         """Get the full path for an item"""
-        path_parts = []
-        while item:
-            path_parts.insert(0, self.tree.item(item)['text'])
-            item = self.tree.parent(item)
-        return os.path.join(self.prompt_dir, *path_parts[1:]) if len(path_parts) > 1 else self.prompt_dir
+        return self.snapshot.full_path(self.item_paths[item])
+
+    def get_budget(self):
+        """Return the token budget from the entry, or None when unset or invalid"""
+        value = self.budget_var.get().strip()
+        if not value.isdigit():
+            if value:
+                print(f"Ignoring invalid token budget: {value}")
+            return None
+        return int(value)
+
+    def get_import_depth(self):
+        """Return the import depth from the spinbox, defaulting to 1 when invalid"""
+        value = self.deps_var.get().strip()
+        if not value.isdigit() or int(value) < 1:
+            print(f"Ignoring invalid import depth: {value}")
+            return 1
+        return int(value)
 
-    def get_selected_files(self):
-        """Return list of selected file paths"""
-        return sorted(list(self.selected_paths))
+    def add_imports(self):
+        """Select the files the current selection imports, up to the chosen depth"""
+        if not self.selected_paths:
+            return
+        from ..utils.import_graph import ImportGraph
+        self.sync_line_ranges()
+        cache = ContentCache.open(self.prompt_dir)
+        try:
+            reader = ParallelFileReader(self.prompt_dir, cache=cache, meta=self.snapshot.meta,
+                                        remote=self.snapshot.remote)
+            graph = ImportGraph(self.snapshot, reader, cache)
+            added = graph.expand(sorted(self.selected_paths), self.get_import_depth())
+        finally:
+            if cache:
+                cache.close()
+        print(f"Added {len(added)} imported files")
+        for path in added:
+            self.set_selected(path, True)
+            self.update_item_tags(path)
+        self.update_selection_display()
+        self.update_meter()
+
+    def get_selected_files(self, sync=True):
+        """Return list of selected file paths, with :start-end where a range was given"""
+        if sync:
+            self.sync_line_ranges()
+        return [format_line_range(path, self.line_ranges.get(path)) for path in sorted(self.selected_paths)]
 
     def update_status(self):
         """Update the status label based on checkbox states"""
@@ -374,54 +727,65 @@ class FileTreeView:
             status_parts.append("structure")
         if self.include_context_var.get():
             status_parts.append("context")
+        if self.outline_var.get():
+            status_parts.append("outlines")
+        if self.minify_var.get():
+            status_parts.append("minified files")
             
         status_text = "Including: " + ", ".join(status_parts) if status_parts else "No additional content selected"
+        if self.scan_status:
+            status_text = f"{self.scan_status} | {status_text}"
         self.status_label.config(text=status_text)
+        self.update_meter()
 
     def copy_to_clipboard(self):
         """Generate and copy output to clipboard"""
+        self.wait_for_scan()
         selected_files = self.get_selected_files()
         
-        # Generate output
-        output = ["<project-context>"]
-        
-        # Add selected files content
-        for file in sorted(selected_files):
-            full_path = os.path.join(self.prompt_dir, file)
-            content = get_file_contents(full_path)
-            if content is not None:
-                output.append(f"```{file}\n{content}\n```")
-        
-        # Add project-context closing tag
-        output.append("</project-context>")
-        
-        # Add structure section if requested
+        # Build structure and context first so they count against the budget
+        structure_section = None
         if self.include_structure_var.get():
-            structure = generate_directory_structure(self.prompt_dir, self.ignore_patterns, self.always_ignore)
             # Don't JSON serialize the structure - just add it directly
-            output.append(f"\n{structure}")
+            structure_section = generate_directory_structure(self.prompt_dir, self.snapshot)
             
-        # Add context if requested
+        context_section = None
         if self.include_context_var.get():
             ctx_path = Path(self.prompt_dir) / 'prompting' / 'cli' / 'ctx.xml'
             if ctx_path.exists():
                 try:
                     with open(ctx_path, 'r', encoding='utf-8') as f:
                         context_content = f.read()
-                    output.extend([
-                        "\n<context>",
-                        context_content,
-                        "</context>"
-                    ])
+                    context_section = f"<context>\n{context_content}\n</context>"
                 except Exception as e:
                     print(f"Error reading ctx.xml: {e}")
         
-        # Copy to clipboard
-        final_output = "\n".join(output)
-        pyperclip.copy(final_output)
+        budget = self.get_budget()
+        overhead = sum(estimate_tokens(s) for s in (structure_section, context_section) if s)
+        full = [p.strip() for p in self.full_var.get().split(',') if p.strip()]
+        cache = ContentCache.open(self.prompt_dir)
+        try:
+            with PackWriter() as writer:
+                reader, _, truncated = write_files(
+                    writer, sorted(selected_files),
+                    partial(ParallelFileReader, self.prompt_dir, cache=cache, meta=self.snapshot.meta,
+                            remote=self.snapshot.remote),
+                    self.snapshot.meta, cache,
+                    budget=TokenBudget(budget, self.priority, overhead) if budget is not None else None,
+                    outline=self.outline_var.get(), full=full, minify=self.minify_var.get(),
+                    tag="project-context"
+                )
+                if structure_section is not None:
+                    writer.write_section(structure_section)
+                if context_section is not None:
+                    writer.write_section(context_section)
+        finally:
+            if cache:
+                cache.close()
         
         print(f"Project context has been copied to clipboard!")
         print(f"Processed {len(selected_files)} files.")
+        print(reader.stats.summary())
         if not self.include_structure_var.get():
             print("Project structure was excluded.")
         if not self.include_context_var.get():
@@ -429,16 +793,19 @@ class FileTreeView:
         
         self.window.destroy()
 
-        # Save selection for again
-        selection_file = os.path.join(self.prompt_dir, 'prompting', 'cli', 'last_selection.json')
-        if os.path.exists(os.path.dirname(selection_file)):
-            with open(selection_file, 'w') as f:
-                json.dump({"files": selected_files}, f)
+        # Save selection and content hashes for again
+        # Truncated files were not sent in full, so 'again --changed' must send them again
+        digests = {path: digest for path, digest in reader.digests.items() if path not in truncated}
+        save_selection(self.prompt_dir, selected_files, digests)
 
-def open_ui(prompt_dir, include_structure=1):
+def open_ui(prompt_dir, include_structure=1, budget=None, priority=DEFAULT_PRIORITY, minify=False,
+            outline=False, full=(), deps=1, target=None):
     """Open the UI selector"""
     if prompt_dir == '.':
         prompt_dir = os.getcwd()
     
-    app = FileTreeView(prompt_dir, include_structure)
-    app.window.mainloop()
\ No newline at end of file
+    app = FileTreeView(prompt_dir, include_structure, budget=budget, priority=priority, minify=minify,
+                       outline=outline, full=full, deps=deps, target=target)
+    app.window.mainloop()
+    if app.relevance is not None:
+        app.relevance.close()
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from .token_budget import estimate_tokens
+
+CACHE_DIR = os.path.join('prompting', 'cli', 'cache')
+CACHE_FILE = 'content.sqlite3'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Bump when the stored format or the binary classification rules change
+CACHE_VERSION = 3
+
+# (size, mtime_ns, inode) - any change means the cached entry is stale
+CacheKey = Tuple[int, int, int]
+
+@dataclass
+class CacheEntry:
+    is_binary: bool
+    text: Optional[str]
+    digest: Optional[str]
+    tokens: Optional[int] = None
+
+def stat_key(full_path: str) -> Optional[CacheKey]:
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+class ContentCache:
+    """Persistent per-project cache of decoded file contents and classifications.
+
+    Entries live in ``prompting/cli/cache/content.sqlite3`` and are keyed by
+    relative path plus (size, mtime_ns, inode), so an unchanged file is served
+    without being opened. Once the stored text exceeds ``max_bytes`` the least
+    recently used entries are evicted when the cache is closed; their token
+    estimate is kept, so the UI can still size a selection without reading.
+    """
+
+    def __init__(self, project_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.join(project_dir, CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[str, float] = {}
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, CACHE_FILE))
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS entries")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " is_binary INTEGER, digest TEXT, text TEXT, stored_bytes INTEGER DEFAULT 0,"
+            " last_used REAL, tokens INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outlines ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " version INTEGER, outline TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS imports ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " version INTEGER, specs TEXT)"
+        )
+
+    @classmethod
+    def open(cls, project_dir: str) -> Optional['ContentCache']:
+        """Open the cache if the project has been initialised with ``capi init``."""
+        if not os.path.isdir(os.path.join(project_dir, 'prompting', 'cli')):
+            return None
+        try:
+            return cls(project_dir)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: content cache unavailable: {e}", file=sys.stderr)
+            return None
+
+    def lookup(self, rel_path: str, key: CacheKey) -> Optional[CacheEntry]:
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, inode, is_binary, text, digest, tokens FROM entries WHERE path = ?",
+            (rel_path,)
+        ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(key):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[rel_path] = time.time()
+        return CacheEntry(is_binary=bool(row[3]), text=row[4], digest=row[5], tokens=row[6])
+
+    def store_classification(self, rel_path: str, key: CacheKey, is_binary: bool) -> None:
+        # Keep any cached text when the key is unchanged, otherwise start a fresh row
+        self.conn.execute(
+            "INSERT INTO entries (path, size, mtime_ns, inode, is_binary, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(path) DO UPDATE SET is_binary = excluded.is_binary,"
+            " text = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns"
+            "  AND inode = excluded.inode THEN text ELSE NULL END,"
+            " digest = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns"
+            "  AND inode = excluded.inode THEN digest ELSE NULL END,"
+            " stored_bytes = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns"
+            "  AND inode = excluded.inode THEN stored_bytes ELSE 0 END,"
+            " tokens = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns"
+            "  AND inode = excluded.inode THEN tokens ELSE NULL END,"
+            " size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,"
+            " last_used = excluded.last_used",
+            (rel_path, *key, int(is_binary), time.time())
+        )
+
+    def store_text(self, rel_path: str, key: CacheKey, text: str, digest: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries"
+            " (path, size, mtime_ns, inode, is_binary, digest, text, stored_bytes, last_used, tokens)"
+            " VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?, ?)",
+            (rel_path, *key, digest, text, len(text), time.time(), estimate_tokens(text))
+        )
+
+    def lookup_outline(self, rel_path: str, key: CacheKey, version: int) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, inode, version, outline FROM outlines WHERE path = ?",
+            (rel_path,)
+        ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(key) or row[3] != version:
+            return None
+        return row[4]
+
+    def store_outline(self, rel_path: str, key: CacheKey, version: int, outline: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO outlines (path, size, mtime_ns, inode, version, outline)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (rel_path, *key, version, outline)
+        )
+
+    def lookup_imports(self, rel_path: str, key: CacheKey, version: int) -> Optional[List[str]]:
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, inode, version, specs FROM imports WHERE path = ?",
+            (rel_path,)
+        ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(key) or row[3] != version:
+            return None
+        return json.loads(row[4])
+
+    def store_imports(self, rel_path: str, key: CacheKey, version: int, specs: List[str]) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO imports (path, size, mtime_ns, inode, version, specs)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (rel_path, *key, version, json.dumps(specs))
+        )
+
+    def _evict(self) -> None:
+        total = self.conn.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed: List[Tuple[str]] = []
+        for path, stored in self.conn.execute(
+            "SELECT path, stored_bytes FROM entries WHERE stored_bytes > 0 ORDER BY last_used"
+        ):
+            if total <= self.max_bytes:
+                break
+            doomed.append((path,))
+            total -= stored
+        # Drop the text but keep the classification, which is cheap to hold
+        self.conn.executemany(
+            "UPDATE entries SET text = NULL, stored_bytes = 0 WHERE path = ?", doomed
+        )
+
+    def close(self) -> None:
+        try:
+            if self._touched:
+                self.conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE path = ?",
+                    [(used, path) for path, used in self._touched.items()]
+                )
+            self._evict()
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+    def __enter__(self) -> 'ContentCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
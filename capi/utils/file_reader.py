@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from . import profiler
+from .content_cache import ContentCache, stat_key
+from .file_utils import decode_contents
+from .large_files import SizePolicy, parse_line_range, read_limited, read_line_range, slice_lines
+
+def default_jobs() -> int:
+    # Same default as ThreadPoolExecutor: reads are I/O bound, not CPU bound
+    return min(32, (os.cpu_count() or 1) + 4)
+
+@dataclass
+class ReadStats:
+    files: int = 0
+    bytes: int = 0
+    cached: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        cached = f", {self.cached} from cache" if self.cached else ""
+        return (
+            f"Read {self.files} files ({self.bytes / 1_048_576:.2f} MB{cached}) in {self.elapsed:.2f}s "
+            f"- {self.files / elapsed:.1f} files/s, {self.bytes / 1_048_576 / elapsed:.2f} MB/s"
+        )
+
+def _sliced(text: str) -> Tuple[str, int, str]:
+    """Result for a line range, digested as UTF-8 text so cached and fresh reads agree."""
+    data = text.encode('utf-8')
+    return text, len(data), hashlib.sha1(data).hexdigest()
+
+def _read(full_path: str, policy: Optional[SizePolicy] = None,
+          line_range=None) -> Tuple[Optional[str], int, Optional[str]]:
+    try:
+        if line_range is not None:
+            return _sliced(decode_contents(read_line_range(full_path, line_range)))
+        if policy is not None and policy.applies_to(os.path.getsize(full_path)):
+            content = read_limited(full_path, policy)
+        else:
+            with open(full_path, 'rb') as f:
+                content = f.read()
+        return decode_contents(content), len(content), hashlib.sha1(content).hexdigest()
+    except Exception as e:
+        print(f"Error reading file {full_path}: {e}", file=sys.stderr)
+        return None, 0, None
+
+class _Done:
+    """Already-available result with the same interface as a Future."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+class ParallelFileReader:
+    """Read files on a bounded thread pool, yielding results in input order.
+
+    At most ``jobs * 4`` reads are in flight at once, so memory stays bounded
+    even for very large selections. When a ``ContentCache`` is given, files
+    whose (size, mtime_ns, inode) key is unchanged are served from it and
+    never opened; ``meta`` lets callers pass stat info they already have.
+
+    Entries may be ``path:start-end`` line-range specs, and files larger than
+    the ``SizePolicy`` limit are sampled with memory-mapped slices instead of
+    being read whole. Results are keyed by the spec as given.
+
+    With a ``remote`` index client (see ``capi serve``) contents come from the
+    daemon's warm in-memory copies instead of the filesystem.
+    """
+
+    def __init__(self, root: str, jobs: Optional[int] = None,
+                 cache: Optional[ContentCache] = None, meta: Optional[Dict] = None,
+                 policy: Optional[SizePolicy] = None, remote=None):
+        self.root = root
+        self.remote = remote
+        self.jobs = jobs or default_jobs()
+        self.cache = cache
+        self.policy = policy or SizePolicy()
+        # ``capi serve`` does not notice in-place edits, so its stat info cannot key the cache
+        self.meta = (meta or {}) if remote is None else {}
+        self.stats = ReadStats()
+        self.digests: Dict[str, str] = {}
+        self._read_file = profiler.timed('read file', _read)
+
+    def _key(self, rel_path: str, full_path: str):
+        info = self.meta.get(rel_path)
+        if info is not None:
+            return (info.size, info.mtime_ns, info.inode)
+        return stat_key(full_path)
+
+    def key(self, rel_path: str):
+        """Cache key of ``rel_path``: the ``meta`` stat info if trusted, else a fresh stat."""
+        return self._key(rel_path, os.path.join(self.root, rel_path))
+
+    def _submit(self, pool, spec: str):
+        if self.remote is not None:
+            try:
+                return spec, None, _Done(self.remote.read(spec, self.policy))
+            except (OSError, ValueError, RuntimeError, ConnectionError) as e:
+                # The daemon went away or failed this read; carry on locally
+                print(f"Warning: capi serve read failed ({e}), reading from disk", file=sys.stderr)
+                self.remote = None
+        try:
+            rel_path, line_range = parse_line_range(spec)
+        except ValueError as e:
+            print(f"Error reading file {spec}: {e}", file=sys.stderr)
+            return spec, None, _Done((None, 0, None))
+        full_path = os.path.join(self.root, rel_path)
+        key = self._key(rel_path, full_path) if self.cache else None
+        # Size-limited reads are partial, so they are neither served from nor stored in the cache
+        if key is not None and self.policy.applies_to(key[0]) and line_range is None:
+            key = None
+        if key is not None:
+            entry = self.cache.lookup(rel_path, key)
+            if entry is not None and entry.text is not None:
+                self.stats.cached += 1
+                if line_range is not None:
+                    return spec, None, _Done(_sliced(slice_lines(entry.text, line_range)))
+                return spec, None, _Done((entry.text, key[0], entry.digest))
+            if line_range is not None:
+                key = None
+        if pool is None:
+            return spec, key, _Done(self._read_file(full_path, self.policy, line_range))
+        return spec, key, pool.submit(self._read_file, full_path, self.policy, line_range)
+
+    def _finish(self, spec: str, key, future) -> Optional[str]:
+        content, size, digest = future.result()
+        if content is None:
+            self.stats.errors += 1
+            return None
+        self.stats.files += 1
+        self.stats.bytes += size
+        if digest:
+            self.digests[spec] = digest
+        if key is not None:
+            self.cache.store_text(spec, key, content, digest)
+        return content
+
+    def read(self, rel_paths: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        start = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.jobs) if self.jobs > 1 else None
+        window = self.jobs * 4
+        pending = deque()
+        try:
+            for rel_path in rel_paths:
+                pending.append(self._submit(pool, rel_path))
+                if len(pending) >= window:
+                    done_path, key, future = pending.popleft()
+                    yield done_path, self._finish(done_path, key, future)
+            while pending:
+                done_path, key, future = pending.popleft()
+                yield done_path, self._finish(done_path, key, future)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            self.stats.elapsed += time.perf_counter() - start
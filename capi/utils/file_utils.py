@@ -1,6 +1,6 @@
 import os
-import fnmatch
-from pathlib import Path
+import sys
+from .large_files import read_line_range
 
 def get_gitignore_patterns(root_path: str) -> list[str]:
     patterns = []
@@ -14,66 +14,78 @@ def get_gitignore_patterns(root_path: str) -> list[str]:
                     patterns.append(line)
     return patterns
 
-def should_ignore(path: str, patterns: list[str]) -> bool:
-    path = Path(path)
-    
-    # Check against base patterns first
-    base_name = path.name
-    if any(p in base_name for p in ['__pycache__', '.pyc', '.git', '.DS_Store']):
-        return True
+# Bytes that count as text; translate() deletes them so the remainder is the non-text count
+_TEXT_CHARS = bytes(range(32, 127)) + b'\n\r\t\f\b'
+
+BINARY_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.pdf', '.zip', '.gz',
+    '.tgz', '.bz2', '.xz', '.7z', '.rar', '.tar', '.jar', '.whl', '.egg', '.so', '.dll',
+    '.dylib', '.exe', '.bin', '.o', '.a', '.lib', '.pyc', '.pyo', '.class', '.sqlite3',
+    '.db', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp3', '.mp4', '.wav', '.ogg',
+    '.mov', '.avi', '.mkv', '.psd', '.xlsx', '.docx', '.pptx',
+})
+
+def is_binary_sample(sample: bytes) -> bool:
+    if not sample:
+        return False
         
-    # Convert path to posix format for consistent matching
-    posix_path = path.as_posix()
-    
-    for pattern in patterns:
-        pattern = pattern.rstrip('/')
+    # Consider a file as binary if it contains null bytes
+    if b'\x00' in sample:
+        return True
         
-        # Handle pattern variations
-        if pattern.startswith('/'):
-            if fnmatch.fnmatch(posix_path, pattern[1:]):
-                return True
-        elif pattern.startswith('**/'):
-            if fnmatch.fnmatch(posix_path, pattern[3:]):
-                return True
-        else:
-            if fnmatch.fnmatch(base_name, pattern):
-                return True
-            if fnmatch.fnmatch(posix_path, f'**/{pattern}'):
-                return True
-            
-    return False
+    # Check for high concentration of non-text bytes
+    non_text = len(sample.translate(None, _TEXT_CHARS))
+    return non_text / len(sample) > 0.3
 
 def is_binary_file(file_path: str, sample_size: int = 1024) -> bool:
+    if os.path.splitext(file_path)[1].lower() in BINARY_EXTENSIONS:
+        return True
     try:
         with open(file_path, 'rb') as f:
             sample = f.read(sample_size)
-            
-        # Consider a file as binary if it contains null bytes
-        if b'\x00' in sample:
-            return True
-            
-        # Check for high concentration of non-text bytes
-        text_chars = bytes(range(32, 127)) + b'\n\r\t\f\b'
-        non_text = sum(1 for byte in sample if byte not in text_chars)
-        
-        return non_text / len(sample) > 0.3
-        
+        return is_binary_sample(sample)
     except Exception:
         return True
 
-def get_file_contents(file_path: str) -> str | None:
+class BinaryClassifier:
+    """Memoising wrapper around ``is_binary_file`` so each path is classified once per run."""
+
+    def __init__(self, sample_size: int = 1024):
+        self.sample_size = sample_size
+        self._memo: dict[str, bool] = {}
+
+    def is_binary(self, file_path: str) -> bool:
+        result = self._memo.get(file_path)
+        if result is None:
+            result = is_binary_file(file_path, self.sample_size)
+            self._memo[file_path] = result
+        return result
+
+    def remember(self, file_path: str, is_binary: bool) -> None:
+        self._memo[file_path] = is_binary
+
+    def forget(self, file_path: str) -> None:
+        self._memo.pop(file_path, None)
+
+def decode_contents(content: bytes) -> str:
+    # Try to decode with utf-8
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        # If utf-8 fails, try with a more permissive encoding
+        return content.decode('latin-1')
+
+def get_file_contents(file_path: str, line_range: tuple[int, int] | None = None) -> str | None:
     try:
         # Read file in binary mode first to handle potential encoding issues
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        if line_range is not None:
+            content = read_line_range(file_path, line_range)
+        else:
+            with open(file_path, 'rb') as f:
+                content = f.read()
             
-        # Try to decode with utf-8
-        try:
-            return content.decode('utf-8')
-        except UnicodeDecodeError:
-            # If utf-8 fails, try with a more permissive encoding
-            return content.decode('latin-1')
+        return decode_contents(content)
             
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
+        print(f"Error reading file {file_path}: {e}", file=sys.stderr)
         return None
\ No newline at end of file
@@ -0,0 +1,41 @@
+import os
+import shutil
+import subprocess
+from typing import List, Optional
+
+# Set to always walk the tree, e.g. to compare against the git fast path
+NO_GIT_ENV = 'CAPI_NO_GIT'
+
+def find_git_dir(path: str) -> Optional[str]:
+    """Return the ``.git`` entry of the checkout containing ``path``, if any."""
+    current = os.path.abspath(path)
+    while True:
+        candidate = os.path.join(current, '.git')
+        # A worktree or submodule has a .git file pointing at the real git dir
+        if os.path.isdir(candidate) or os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def list_git_files(root: str, untracked: bool = True) -> Optional[List[str]]:
+    """List files under ``root`` from the git index, relative to ``root`` with '/' separators.
+
+    With ``untracked`` the untracked-but-not-ignored files are included too,
+    so the result matches what a .gitignore-aware walk would find. Returns
+    None when ``root`` is not in a git checkout or git is unavailable, in
+    which case callers fall back to walking the tree.
+    """
+    if os.environ.get(NO_GIT_ENV) or find_git_dir(root) is None or shutil.which('git') is None:
+        return None
+    cmd = ['git', '-C', root, 'ls-files', '-z', '--cached']
+    if untracked:
+        cmd += ['--others', '--exclude-standard']
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # Unmerged paths are listed once per stage; keep the first of each
+    paths = dict.fromkeys(os.fsdecode(p) for p in result.stdout.split(b'\0') if p)
+    return list(paths)
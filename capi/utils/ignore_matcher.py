@@ -0,0 +1,225 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from .file_utils import get_gitignore_patterns
+
+# Patterns excluded in every project regardless of .gitignore contents
+ALWAYS_IGNORE = [
+    'venv', '__pycache__', '.git', 'node_modules', '.gitignore',
+    'capi.egg-info', '*.pyc', '.DS_Store', '/prompting/cli/cache/',
+    '/prompting/cli/parts/'
+]
+
+_GLOB_CHARS = set('*?[\\')
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a gitignore glob (without anchoring) into a regex fragment."""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i):
+                at_start = i == 0 or pattern[i - 1] == '/'
+                at_end = i + 2 == n or pattern[i + 2] == '/'
+                if at_start and at_end:
+                    if i + 2 == n:
+                        # Trailing "/**" matches everything inside
+                        out.append('.*')
+                        i += 2
+                    else:
+                        # "**/" matches zero or more directories
+                        out.append('(?:.*/)?')
+                        i += 3
+                    continue
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                out.append('\\[')
+                i += 1
+            else:
+                body = pattern[i + 1:j]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = j + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+class _Rule:
+    __slots__ = ('regex', 'negate', 'dir_only')
+
+    def __init__(self, regex: str, negate: bool, dir_only: bool):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+def _parse_rule(line: str) -> Optional[_Rule]:
+    line = line.rstrip()
+    if not line or line.startswith('#'):
+        return None
+
+    negate = False
+    if line.startswith('!'):
+        negate = True
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+
+    # A slash anywhere but the end anchors the pattern to its .gitignore directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+    body = _translate_glob(line)
+    if not anchored and not line.startswith('**'):
+        body = '(?:.*/)?' + body
+    return _Rule(body, negate, dir_only)
+
+class PatternSet:
+    """Rules from one ignore file, compiled into combined regexes.
+
+    Rules are joined into a single alternation in reverse order so the first
+    alternative to match is the last matching rule, which is what gitignore
+    precedence requires; the matched group name tells whether it negates.
+    """
+
+    def __init__(self, lines: List[str]):
+        rules = [r for r in (_parse_rule(line) for line in lines) if r is not None]
+        self.has_negation = any(r.negate for r in rules)
+
+        # Plain basenames are the common case and can skip the regex entirely
+        self.literal_names = set()
+        if not self.has_negation:
+            for line in lines:
+                name = line.strip().rstrip('/')
+                if name and not name.startswith('#') and '/' not in name and not _GLOB_CHARS & set(name):
+                    if not line.strip().endswith('/'):
+                        self.literal_names.add(name)
+
+        self._negated = {}
+        self._file_regex = self._compile([r for r in rules if not r.dir_only])
+        self._dir_regex = self._compile(rules)
+        self.empty = not rules
+
+    def _compile(self, rules: List[_Rule]) -> Optional['re.Pattern']:
+        if not rules:
+            return None
+        parts = []
+        for rule in reversed(rules):
+            name = f'r{len(self._negated)}'
+            self._negated[name] = rule.negate
+            parts.append(f'(?P<{name}>{rule.regex})')
+        return re.compile('(?:' + '|'.join(parts) + r')\Z', re.DOTALL)
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """Return True (ignored), False (re-included) or None (no rule matched)."""
+        if self.literal_names and rel_path.rpartition('/')[2] in self.literal_names:
+            return True
+        regex = self._dir_regex if is_dir else self._file_regex
+        if regex is None:
+            return None
+        m = regex.match(rel_path)
+        if m is None:
+            return None
+        return not self._negated[m.lastgroup]
+
+class IgnoreMatcher:
+    """Compiled gitignore matcher for one project root.
+
+    Built once per root from ``ALWAYS_IGNORE`` plus the root ``.gitignore``;
+    nested ``.gitignore`` files are loaded lazily the first time a path below
+    their directory is checked. Paths are relative to the root and may use
+    either separator.
+    """
+
+    def __init__(self, root: str, extra_patterns: Optional[List[str]] = None, nested: bool = True):
+        self.root = os.path.abspath(root)
+        self.nested = nested
+        self.always = PatternSet(ALWAYS_IGNORE if extra_patterns is None else extra_patterns)
+        self._sets: Dict[str, Optional[PatternSet]] = {}
+        self._chain_cache: Dict[str, List[Tuple[str, PatternSet]]] = {}
+        self._dir_cache: Dict[str, bool] = {}
+
+    def _pattern_set(self, rel_dir: str) -> Optional[PatternSet]:
+        if rel_dir in self._sets:
+            return self._sets[rel_dir]
+        patterns = get_gitignore_patterns(os.path.join(self.root, rel_dir) if rel_dir else self.root)
+        pattern_set = PatternSet(patterns) if patterns else None
+        self._sets[rel_dir] = pattern_set
+        return pattern_set
+
+    def _applicable_sets(self, rel_parent: str) -> List[Tuple[str, PatternSet]]:
+        # Deepest .gitignore first: lower-level files override higher ones
+        cached = self._chain_cache.get(rel_parent)
+        if cached is not None:
+            return cached
+        if not rel_parent:
+            chain = []
+        elif self.nested:
+            chain = list(self._applicable_sets(rel_parent.rpartition('/')[0]))
+            pattern_set = self._pattern_set(rel_parent)
+            if pattern_set is not None:
+                chain.insert(0, (rel_parent, pattern_set))
+        else:
+            chain = list(self._applicable_sets(''))
+        if not rel_parent:
+            pattern_set = self._pattern_set('')
+            if pattern_set is not None:
+                chain.append(('', pattern_set))
+        self._chain_cache[rel_parent] = chain
+        return chain
+
+    def match(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Check a single path, assuming its parent directories are not ignored.
+
+        This is the fast path for top-down walks that already prune ignored
+        directories.
+        """
+        rel_path = rel_path.replace(os.sep, '/').strip('/')
+        if not rel_path or rel_path == '.':
+            return False
+        if self.always.match(rel_path, is_dir):
+            return True
+        for rel_dir, pattern_set in self._applicable_sets(rel_path.rpartition('/')[0]):
+            sub_path = rel_path[len(rel_dir) + 1:] if rel_dir else rel_path
+            result = pattern_set.match(sub_path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Check a path including its parents; an ignored directory hides everything below it."""
+        rel_path = rel_path.replace(os.sep, '/').strip('/')
+        if not rel_path or rel_path == '.':
+            return False
+        parent = rel_path.rpartition('/')[0]
+        if parent and self._is_dir_ignored(parent):
+            return True
+        return self.match(rel_path, is_dir)
+
+    def _is_dir_ignored(self, rel_dir: str) -> bool:
+        cached = self._dir_cache.get(rel_dir)
+        if cached is None:
+            cached = self.is_ignored(rel_dir, is_dir=True)
+            self._dir_cache[rel_dir] = cached
+        return cached
@@ -0,0 +1,172 @@
+import ast
+import posixpath
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+from . import profiler
+from .content_cache import ContentCache
+from .large_files import parse_line_range
+
+# Bump when import extraction changes so cached specifiers are re-parsed
+IMPORTS_VERSION = 1
+# Directories tried for absolute Python imports, besides the project root
+PYTHON_SOURCE_ROOTS = ('', 'src')
+
+PYTHON_EXTENSIONS = ('.py', '.pyi')
+JS_EXTENSIONS = ('.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.mts', '.cts')
+
+_JS_IMPORT_RE = re.compile(
+    r'''(?:\bimport\s+(?:type\s+)?(?:[\w*${}\s,]+?\s+from\s+)?'''
+    r'''|\bexport\s+(?:type\s+)?[\w*${}\s,]+?\s+from\s+'''
+    r'''|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"\n]+)['"]'''
+)
+
+def python_imports(text: str) -> List[str]:
+    """Dotted module specifiers imported by ``text``; relative ones keep their leading dots.
+
+    ``from a import b`` yields ``a.b`` since ``b`` may be a submodule;
+    resolution falls back to ``a`` when it is not.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    specs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specs.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            prefix = '.' * node.level + (node.module or '')
+            for alias in node.names:
+                if alias.name == '*':
+                    specs.append(prefix)
+                elif node.module:
+                    specs.append(f"{prefix}.{alias.name}")
+                else:
+                    specs.append(prefix + alias.name)
+    return list(dict.fromkeys(specs))
+
+def js_imports(text: str) -> List[str]:
+    """Best-effort ``import``/``export from``/``require()`` specifiers."""
+    return list(dict.fromkeys(_JS_IMPORT_RE.findall(text)))
+
+def extract_imports(rel_path: str, text: str) -> List[str]:
+    if rel_path.endswith(PYTHON_EXTENSIONS):
+        return python_imports(text)
+    if rel_path.endswith(JS_EXTENSIONS):
+        return js_imports(text)
+    return []
+
+def _has_imports(rel_path: str) -> bool:
+    return rel_path.endswith(PYTHON_EXTENSIONS) or rel_path.endswith(JS_EXTENSIONS)
+
+def resolve_python(spec: str, importer: str, files: set) -> Optional[str]:
+    """Map a module specifier to a project file, dropping trailing names that are not modules."""
+    level = len(spec) - len(spec.lstrip('.'))
+    parts = [p for p in spec[level:].split('.') if p]
+    if level:
+        base = posixpath.dirname(importer)
+        for _ in range(level - 1):
+            base = posixpath.dirname(base)
+        roots = [base]
+    else:
+        roots = list(PYTHON_SOURCE_ROOTS)
+    while parts or level:
+        for root in roots:
+            path = posixpath.join(root, *parts) if parts else root
+            for candidate in (path + '.py', path + '.pyi', posixpath.join(path, '__init__.py')):
+                candidate = candidate.lstrip('/')
+                if candidate in files:
+                    return candidate
+        if not parts:
+            break
+        parts.pop()
+    return None
+
+def resolve_js(spec: str, importer: str, files: set) -> Optional[str]:
+    """Resolve relative specifiers the way bundlers do; packages are outside the project."""
+    if not spec.startswith('.'):
+        return None
+    base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), spec))
+    candidates = [base]
+    candidates += [base + ext for ext in JS_EXTENSIONS + ('.d.ts',)]
+    candidates += [f"{base}/index{ext}" for ext in JS_EXTENSIONS]
+    for candidate in candidates:
+        if candidate in files:
+            return candidate
+    return None
+
+class ImportGraph:
+    """Static import graph over the project, built lazily from the files it is asked about.
+
+    Import specifiers are cached per file in the content cache, keyed by
+    (size, mtime_ns, inode), so only files that changed are read and parsed
+    again. Specifiers are resolved against the current snapshot on every
+    run, which keeps the graph right when files are added or removed.
+    """
+
+    def __init__(self, snapshot, reader, cache: Optional[ContentCache] = None):
+        self.snapshot = snapshot
+        self.reader = reader
+        self.cache = cache
+        self.files = set(snapshot.files)
+        self._edges: Dict[str, List[str]] = {}
+        self.parsed = 0
+
+    def _load(self, paths: Iterable[str]) -> None:
+        """Fill in the edges of ``paths``, reading only files without cached specifiers."""
+        stale = []
+        for path in paths:
+            if path in self._edges:
+                continue
+            key = self.reader.key(path) if self.cache is not None else None
+            specs = None
+            if key is not None:
+                specs = self.cache.lookup_imports(path, key, IMPORTS_VERSION)
+            if specs is None:
+                stale.append(path)
+            else:
+                self._edges[path] = self._resolve(path, specs)
+        extract = profiler.timed('parse imports', extract_imports)
+        for path, text in self.reader.read(stale):
+            specs = extract(path, text) if text is not None else []
+            self.parsed += 1
+            key = self.reader.key(path) if self.cache is not None else None
+            if key is not None:
+                self.cache.store_imports(path, key, IMPORTS_VERSION, specs)
+            self._edges[path] = self._resolve(path, specs)
+
+    def _resolve(self, importer: str, specs: List[str]) -> List[str]:
+        resolve = resolve_python if importer.endswith(PYTHON_EXTENSIONS) else resolve_js
+        deps = []
+        for spec in specs:
+            target = resolve(spec, importer, self.files)
+            if target is not None and target != importer and target not in deps:
+                deps.append(target)
+        return deps
+
+    def imports_of(self, path: str) -> List[str]:
+        self._load([path])
+        return self._edges.get(path, [])
+
+    def expand(self, selection: Sequence[str], depth: int) -> List[str]:
+        """Files reachable from ``selection`` in at most ``depth`` import hops, not already selected.
+
+        Selection entries may be ``path:start-end``; dependencies are always whole files.
+        """
+        seen = {parse_line_range(spec)[0] for spec in selection}
+        frontier = sorted(path for path in seen if path in self.files)
+        added: List[str] = []
+        for _ in range(depth):
+            candidates = [path for path in frontier if _has_imports(path)]
+            self._load(candidates)
+            next_frontier = []
+            for path in candidates:
+                for dep in self._edges.get(path, []):
+                    if dep not in seen:
+                        seen.add(dep)
+                        added.append(dep)
+                        next_frontier.append(dep)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return added
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import socket
+import stat
+import tempfile
+from dataclasses import asdict
+from typing import Callable, Dict, Optional, Tuple
+from .content_cache import ContentCache
+from .large_files import SizePolicy
+from .snapshot import FileInfo, ProjectSnapshot
+
+# Set to skip the daemon and always scan cold, e.g. when benchmarking
+NO_DAEMON_ENV = 'CAPI_NO_DAEMON'
+
+def runtime_dir() -> str:
+    """Per-user directory for daemon sockets, accessible to its owner only.
+
+    ``$XDG_RUNTIME_DIR/capi`` when available, else ``capi-<uid>`` in the temp
+    dir. Raises ``PermissionError`` if the directory belongs to someone else.
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    directory = os.path.join(base, 'capi') if base else os.path.join(tempfile.gettempdir(), f"capi-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is not a directory owned by the current user")
+    if st.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+    return directory
+
+def socket_path(project_dir: str) -> str:
+    """Per-project socket in the runtime dir; project paths can exceed the AF_UNIX length limit."""
+    digest = hashlib.sha1(os.path.abspath(project_dir).encode()).hexdigest()[:12]
+    return os.path.join(runtime_dir(), f"capi-{digest}.sock")
+
+def send_message(sock_file, message: Dict) -> None:
+    sock_file.write(json.dumps(message).encode() + b"\n")
+    sock_file.flush()
+
+def recv_message(sock_file) -> Optional[Dict]:
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+class IndexClient:
+    """Client side of the ``capi serve`` protocol: one JSON object per line each way."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.file = sock.makefile('rwb')
+
+    @classmethod
+    def connect(cls, project_dir: str, timeout: float = 2.0) -> Optional['IndexClient']:
+        if os.environ.get(NO_DAEMON_ENV) or not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'getuid'):
+            return None
+        try:
+            path = socket_path(project_dir)
+            # Only trust a daemon started by the current user
+            if os.stat(path).st_uid != os.getuid():
+                return None
+        except OSError:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self, op: str, **params) -> Dict:
+        send_message(self.file, {"op": op, **params})
+        response = recv_message(self.file)
+        if response is None:
+            raise ConnectionError("capi serve closed the connection")
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def snapshot(self) -> ProjectSnapshot:
+        snapshot = ProjectSnapshot.from_dict(self.request("snapshot")["snapshot"])
+        snapshot.remote = self
+        return snapshot
+
+    def read(self, spec: str, policy: Optional[SizePolicy] = None) -> Tuple[Optional[str], int, Optional[str]]:
+        """Fetch one file (or ``path:start-end`` range) as (text, size, sha1 digest)."""
+        result = self.request("read", path=spec, policy=asdict(policy) if policy else None)
+        return result.get("text"), result.get("size", 0), result.get("digest")
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+        finally:
+            self.sock.close()
+
+def load_snapshot(project_dir: str, cache: Optional[ContentCache] = None,
+                  progress: Optional[Callable[[FileInfo], None]] = None) -> ProjectSnapshot:
+    """Get the project index from a running ``capi serve``, or scan the tree cold.
+
+    ``progress`` only sees files found by a cold scan; a daemon answers at once.
+    """
+    client = IndexClient.connect(project_dir)
+    if client is not None:
+        try:
+            return client.snapshot()
+        except (OSError, ValueError, RuntimeError, ConnectionError):
+            client.close()
+    return ProjectSnapshot.scan(project_dir, cache=cache, progress=progress)
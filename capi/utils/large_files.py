@@ -0,0 +1,117 @@
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+LARGE_FILE_MODES = ('headtail', 'truncate', 'skip', 'full')
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_SAMPLE_BYTES = 64 * 1024
+
+_RANGE_RE = re.compile(r'^(.+):(\d+)-(\d+)$')
+# The notice lines ``read_limited`` puts in place of what it left out
+LIMIT_NOTICE_RE = re.compile(r'^(?:\.\.\. )?\[[^\]\n]*\bby capi\b[^\]\n]*\](?: \.\.\.)?$', re.M)
+
+LineRange = Tuple[int, int]
+
+def parse_line_range(spec: str) -> Tuple[str, Optional[LineRange]]:
+    """Split ``path:start-end`` (1-based, inclusive) into the path and its line range."""
+    m = _RANGE_RE.match(spec.strip())
+    if not m:
+        return spec.strip(), None
+    start, end = int(m.group(2)), int(m.group(3))
+    if start < 1 or end < start:
+        raise ValueError(f"Invalid line range in '{spec}': expected start-end with 1 <= start <= end")
+    return m.group(1), (start, end)
+
+def format_line_range(path: str, line_range: Optional[LineRange]) -> str:
+    return f"{path}:{line_range[0]}-{line_range[1]}" if line_range else path
+
+@dataclass
+class SizePolicy:
+    """What to do with files larger than ``max_bytes``.
+
+    ``headtail`` keeps the first and last ``sample_bytes`` each, ``truncate``
+    keeps the first ``max_bytes``, ``skip`` replaces the file with a one-line
+    note and ``full`` reads everything regardless of size. ``sample_bytes``
+    defaults to at most half of ``max_bytes``, so the two samples together
+    stay within the limit.
+    """
+    max_bytes: int = DEFAULT_MAX_BYTES
+    mode: str = 'headtail'
+    sample_bytes: Optional[int] = None
+
+    def __post_init__(self):
+        if self.sample_bytes is None:
+            self.sample_bytes = min(DEFAULT_SAMPLE_BYTES, self.max_bytes // 2)
+
+    def applies_to(self, size: int) -> bool:
+        return self.mode != 'full' and size > self.max_bytes
+
+def _map(f) -> Optional[mmap.mmap]:
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def read_limited(full_path: str, policy: SizePolicy) -> bytes:
+    """Read only the slices of a large file that the policy keeps."""
+    with open(full_path, 'rb') as f:
+        mm = _map(f)
+        if mm is None:
+            return b''
+        with mm:
+            size = len(mm)
+            if policy.mode == 'skip':
+                return f"[skipped by capi: {size} bytes exceeds the {policy.max_bytes} byte limit]".encode()
+            if policy.mode == 'truncate':
+                cut = mm.rfind(b'\n', 0, policy.max_bytes) + 1 or policy.max_bytes
+                return mm[:cut] + f"\n... [truncated by capi: {size - cut} of {size} bytes omitted]".encode()
+
+            # Head and tail samples, cut back to whole lines
+            head_end = mm.rfind(b'\n', 0, policy.sample_bytes) + 1 or policy.sample_bytes
+            tail_from = max(size - policy.sample_bytes, 0)
+            tail_start = mm.find(b'\n', tail_from) + 1 or tail_from
+            if tail_start <= head_end:
+                return mm[:]
+            omitted = tail_start - head_end
+            return (mm[:head_end]
+                    + f"\n... [{omitted} of {size} bytes omitted by capi] ...\n\n".encode()
+                    + mm[tail_start:])
+
+def read_line_range(full_path: str, line_range: LineRange) -> bytes:
+    """Return lines ``start``..``end`` (1-based, inclusive) touching only the pages needed.
+
+    Gives the same lines as ``slice_lines`` on the whole file's text.
+    """
+    start, end = line_range
+    with open(full_path, 'rb') as f:
+        mm = _map(f)
+        if mm is None:
+            return b''
+        with mm:
+            pos = 0
+            for _ in range(start - 1):
+                pos = mm.find(b'\n', pos)
+                if pos == -1:
+                    return b''
+                pos += 1
+            stop = pos
+            for _ in range(end - start + 1):
+                nxt = mm.find(b'\n', stop)
+                if nxt == -1:
+                    stop = len(mm)
+                    break
+                stop = nxt + 1
+            # Drop the last line's terminator only; blank lines in the range stay
+            if stop > pos and mm[stop - 1] == ord('\n'):
+                stop -= 1
+            return mm[pos:stop]
+
+def slice_lines(text: str, line_range: LineRange) -> str:
+    """Lines ``start``..``end`` (1-based, inclusive) of ``text``, without the final newline."""
+    start, end = line_range
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        # A trailing newline ends the last line rather than starting an empty one
+        lines.pop()
+    return "\n".join(lines[start - 1:end])
@@ -1,8 +1,8 @@
-from openai import OpenAI
 from typing import List, Dict, Optional, Union
 import click
 from termcolor import colored
 import os
+from . import profiler
 
 class LLMApiCaller:
     def __init__(
@@ -41,6 +41,9 @@ class LLMApiCaller:
         self.logit_bias = logit_bias
         self.top_k = top_k
         
+        # The OpenAI client stack is slow to import, so only pay for it here
+        from openai import OpenAI
+
         # Check if we're using DeepInfra or OpenAI
         if "DEEPINFRA_API_TOKEN" in os.environ:
             self.client = OpenAI(
@@ -86,17 +89,18 @@ class LLMApiCaller:
 
     def stream_response(self, messages: List[Dict]) -> None:
         try:
-            stream = self.client.chat.completions.create(
-                **self._get_api_params(messages, stream=True)
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].finish_reason:
-                    pass
-                else:
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        print(colored(content, "green"), end='', flush=True)
+            with profiler.phase("llm stream"):
+                stream = self.client.chat.completions.create(
+                    **self._get_api_params(messages, stream=True)
+                )
+                
+                for chunk in stream:
+                    if chunk.choices[0].finish_reason:
+                        pass
+                    else:
+                        content = chunk.choices[0].delta.content
+                        if content:
+                            print(colored(content, "green"), end='', flush=True)
             
             print()
             
@@ -110,9 +114,10 @@ class LLMApiCaller:
                 click.secho(f"Sending request to model: {self.model}", fg='cyan')
                 click.secho(f"API Key (first 4 chars): {self.api_key[:4]}...", fg='cyan')
             
-            response = self.client.chat.completions.create(
-                **self._get_api_params(messages, stream=False)
-            )
+            with profiler.phase("llm request"):
+                response = self.client.chat.completions.create(
+                    **self._get_api_params(messages, stream=False)
+                )
             return response.choices[0].message.content
         except Exception as e:
             click.secho(f"API Error: {str(e)}", fg='red')
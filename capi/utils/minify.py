@@ -0,0 +1,223 @@
+import ast
+import io
+import json
+import os
+import re
+import tokenize
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from . import profiler
+from .large_files import parse_line_range
+from .token_budget import estimate_tokens
+
+C_LIKE_EXTENSIONS = {
+    '.c', '.h', '.cc', '.cpp', '.cxx', '.hpp', '.hh', '.m', '.mm', '.java', '.kt', '.kts',
+    '.scala', '.swift', '.go', '.rs', '.cs', '.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx',
+    '.php', '.dart', '.groovy', '.proto',
+}
+# Stylesheets keep url(...) intact; plain CSS has no // comments at all
+CSS_EXTENSIONS = {'.css', '.scss', '.less'}
+HASH_COMMENT_EXTENSIONS = {'.yaml', '.yml', '.toml', '.sh', '.bash', '.zsh', '.cfg', '.conf'}
+JSON_EXTENSIONS = {'.json', '.jsonc'}
+
+def _squeeze(lines: Iterable[str], keep: Set[int] = frozenset()) -> str:
+    """Strip trailing whitespace and collapse blank-line runs, leaving ``keep`` lines (0-based) alone."""
+    out = []
+    blank = False
+    for i, line in enumerate(lines):
+        if i in keep:
+            out.append(line)
+            blank = False
+            continue
+        line = line.rstrip()
+        if not line:
+            if blank or not out:
+                continue
+            blank = True
+        else:
+            blank = False
+        out.append(line)
+    while out and not out[-1]:
+        out.pop()
+    return "\n".join(out)
+
+def minify_whitespace(text: str) -> str:
+    return _squeeze(text.split("\n"))
+
+def _docstring_spans(tree: ast.AST) -> Iterator[Tuple[int, int, int, int, bool]]:
+    """Yield (first_line, col, last_line, end_col, is_only_statement) for every docstring.
+
+    Columns are UTF-8 byte offsets, as ``ast`` reports them.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        body = node.body
+        if (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            doc = body[0]
+            yield doc.lineno, doc.col_offset, doc.end_lineno, doc.end_col_offset, len(body) == 1
+
+def _char_col(line: str, byte_col: int) -> int:
+    return len(line.encode('utf-8')[:byte_col].decode('utf-8', errors='ignore'))
+
+def minify_python(text: str) -> str:
+    """Drop comments and docstrings using ``tokenize`` and ``ast``; keeps the code runnable."""
+    try:
+        tree = ast.parse(text)
+        tokens = list(tokenize.generate_tokens(io.StringIO(text).readline))
+    except (SyntaxError, tokenize.TokenError, ValueError):
+        return minify_whitespace(text)
+
+    lines = text.split("\n")
+    # Lines inside multi-line strings must survive untouched
+    protected: Set[int] = set()
+    for tok in tokens:
+        if tok.type == tokenize.STRING and tok.end[0] > tok.start[0]:
+            # 0-based rows after the first; the closing line may still lose trailing space
+            protected.update(range(tok.start[0], tok.end[0] - 1))
+
+    removed: Set[int] = set()
+    for tok in reversed(tokens):
+        if tok.type != tokenize.COMMENT:
+            continue
+        row, col = tok.start
+        # Keep the shebang, encoding cookies and tool pragmas
+        if row <= 2 and (tok.string.startswith('#!') or 'coding' in tok.string):
+            continue
+        if re.match(r'#\s*(type:|noqa|pragma|pylint:|fmt:)', tok.string):
+            continue
+        line = lines[row - 1]
+        lines[row - 1] = line[:col] + line[tok.end[1]:]
+        if not lines[row - 1].strip():
+            removed.add(row - 1)
+
+    # Cut only the docstring's own span, last first so earlier columns stay valid;
+    # it may share its line with the def or with the statements after it
+    for start, col, end, end_col, only in sorted(_docstring_spans(tree), reverse=True):
+        head = lines[start - 1][:_char_col(lines[start - 1], col)]
+        tail = lines[end - 1][_char_col(lines[end - 1], end_col):]
+        if only:
+            # A body cannot be empty, so leave a placeholder in its place
+            line = head + "..." + tail
+        else:
+            stripped = tail.lstrip()
+            line = head + (stripped[1:] if stripped.startswith(';') else tail)
+        lines[start - 1] = line
+        removed.update(range(start, end))
+        if not line.strip():
+            removed.add(start - 1)
+        protected.difference_update(range(start - 1, end))
+
+    return _squeeze((line for i, line in enumerate(lines) if i not in removed),
+                    keep=_shift(protected, removed))
+
+def _shift(rows: Set[int], removed: Set[int]) -> Set[int]:
+    """Map 0-based row numbers to their position once ``removed`` rows are gone."""
+    if not removed:
+        return rows
+    gone = sorted(removed)
+    return {row - bisect_left(gone, row) for row in rows if row not in removed}
+
+def minify_c_like(text: str, line_comments: bool = True, css: bool = False) -> str:
+    """Remove // and /* */ comments, respecting string and template literals.
+
+    Without ``line_comments`` only ``/* */`` goes; with ``css`` the contents of
+    ``url(...)`` are skipped, since unquoted URLs contain ``//``.
+    """
+    out: List[str] = []
+    i, n = 0, len(text)
+    start = 0
+    while i < n:
+        ch = text[i]
+        if css and ch in 'uU' and text[i:i + 4].lower() == 'url(':
+            end = text.find(')', i + 4)
+            i = n if end == -1 else end + 1
+        elif ch in '"\'`':
+            j = i + 1
+            while j < n and text[j] != ch:
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '\n' and ch != '`':
+                    break
+                j += 1
+            i = j + 1
+        elif line_comments and ch == '/' and i + 1 < n and text[i + 1] == '/':
+            out.append(text[start:i])
+            end = text.find('\n', i)
+            i = start = n if end == -1 else end
+        elif ch == '/' and i + 1 < n and text[i + 1] == '*':
+            out.append(text[start:i])
+            end = text.find('*/', i + 2)
+            i = start = n if end == -1 else end + 2
+        else:
+            i += 1
+    out.append(text[start:])
+    return minify_whitespace("".join(out))
+
+def minify_hash_comments(text: str) -> str:
+    """Drop whole-line ``#`` comments (YAML, TOML, shell); inline ones may be inside strings."""
+    lines = text.split("\n")
+    kept = [line for i, line in enumerate(lines)
+            if not (line.lstrip().startswith('#') and not (i == 0 and line.startswith('#!')))]
+    return _squeeze(kept)
+
+def minify_json(text: str) -> str:
+    try:
+        return json.dumps(json.loads(text), separators=(',', ':'), ensure_ascii=False)
+    except ValueError:
+        return minify_whitespace(text)
+
+def minify(rel_path: str, text: str) -> str:
+    """Apply the rules for the file's language; unknown types only lose redundant whitespace."""
+    path, _ = parse_line_range(rel_path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.py', '.pyi'):
+        return minify_python(text)
+    if ext in C_LIKE_EXTENSIONS:
+        return minify_c_like(text)
+    if ext in CSS_EXTENSIONS:
+        return minify_c_like(text, line_comments=ext != '.css', css=True)
+    if ext in JSON_EXTENSIONS:
+        return minify_json(text) if ext == '.json' else minify_c_like(text)
+    if ext in HASH_COMMENT_EXTENSIONS:
+        return minify_hash_comments(text)
+    return minify_whitespace(text)
+
+@dataclass
+class MinifyResult:
+    rel_path: str
+    bytes_before: int
+    bytes_after: int
+    tokens_before: int
+    tokens_after: int
+
+@dataclass
+class Minifier:
+    """Transform stage between reading files and writing them into the pack."""
+    results: List[MinifyResult] = field(default_factory=list)
+
+    def __call__(self, rel_path: str, text: str) -> str:
+        minified = minify(rel_path, text)
+        self.results.append(MinifyResult(
+            rel_path, len(text), len(minified), estimate_tokens(text), estimate_tokens(minified)
+        ))
+        return minified
+
+    def transform(self, read_results: Iterable[Tuple[str, Optional[str]]]) -> Iterator[Tuple[str, Optional[str]]]:
+        apply = profiler.timed('minify', self)
+        for rel_path, content in read_results:
+            yield rel_path, apply(rel_path, content) if content is not None else None
+
+    def report(self) -> List[str]:
+        lines = [f"{'bytes':>9} {'tokens':>8}  saved by --minify"]
+        for r in self.results:
+            if r.bytes_after < r.bytes_before:
+                lines.append(f"{r.bytes_before - r.bytes_after:>9} {r.tokens_before - r.tokens_after:>8}  {r.rel_path}")
+        before = sum(r.bytes_before for r in self.results) or 1
+        saved_bytes = sum(r.bytes_before - r.bytes_after for r in self.results)
+        saved_tokens = sum(r.tokens_before - r.tokens_after for r in self.results)
+        lines.append(f"Minified {len(self.results)} files: saved {saved_bytes} bytes "
+                     f"({saved_bytes / before:.1%}), ~{saved_tokens} tokens")
+        return lines
@@ -0,0 +1,195 @@
+import ast
+import fnmatch
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from . import profiler
+from .content_cache import ContentCache
+from .large_files import LIMIT_NOTICE_RE, parse_line_range
+
+# Bump when the outline format changes so cached outlines are rebuilt
+OUTLINE_VERSION = 2
+# Longer assignments keep their target but lose the value
+MAX_ASSIGNMENT_CHARS = 100
+
+_DECLARATION_PATTERNS = {
+    'js': [
+        r'^\s*(export\s+)?(default\s+)?(async\s+)?function\b',
+        r'^\s*(export\s+)?(default\s+)?(abstract\s+)?class\b',
+        r'^\s*(export\s+)?(declare\s+)?(interface|type|enum|namespace)\b',
+        r'^\s*(export\s+)?(const|let|var)\s+\w+\s*(:[^=]+)?=\s*(async\s*)?(\([^)]*\)|\w+)\s*=>',
+        r'^\s*(public|private|protected|static|async|get|set|\s)*\w+\s*\([^)]*\)\s*(:\s*[\w<>\[\]|, ]+)?\s*\{\s*$',
+    ],
+    'python': [r'^\s*(async\s+def|def|class)\b'],
+    'go': [r'^func\b', r'^type\b'],
+    'rust': [r'^\s*(pub(\([\w:]+\))?\s+)?(async\s+)?(unsafe\s+)?(fn|struct|enum|trait|impl|type|mod)\b'],
+    'java': [
+        r'^\s*(public|private|protected|internal|static|abstract|final|sealed|override|open|data)\b'
+        r'[^;=]*[({]\s*$',
+        r'^\s*(class|interface|enum|record|object|fun)\b',
+    ],
+    'c': [
+        r'^(typedef|struct|class|enum|union|namespace|template)\b',
+        r'^[A-Za-z_][\w\s\*&:<>,]*[\s\*&]+[A-Za-z_][\w:~]*\s*\([^;]*$',
+    ],
+}
+_LANGUAGES = {
+    '.js': 'js', '.jsx': 'js', '.mjs': 'js', '.cjs': 'js', '.ts': 'js', '.tsx': 'js',
+    '.go': 'go', '.rs': 'rust',
+    '.java': 'java', '.kt': 'java', '.kts': 'java', '.scala': 'java', '.cs': 'java', '.swift': 'java',
+    '.c': 'c', '.h': 'c', '.cc': 'c', '.cpp': 'c', '.cxx': 'c', '.hpp': 'c', '.hh': 'c',
+}
+_COMPILED = {lang: re.compile('|'.join(f'(?:{p})' for p in patterns))
+             for lang, patterns in _DECLARATION_PATTERNS.items()}
+
+def _docstring_line(doc: str, indent: str, first_line_only: bool) -> str:
+    doc = doc.strip().split('\n')[0] if first_line_only else doc
+    if '"""' in doc or doc.endswith('"'):
+        return indent + repr(doc)
+    return f'{indent}"""{doc}"""'
+
+def _signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)}):" if bases else f"class {node.name}:"
+    prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}:"
+
+def _assignment(node) -> str:
+    source = ast.unparse(node)
+    if len(source) <= MAX_ASSIGNMENT_CHARS:
+        return source
+    if isinstance(node, ast.AnnAssign):
+        return f"{ast.unparse(node.target)}: {ast.unparse(node.annotation)} = ..."
+    return f"{' = '.join(ast.unparse(t) for t in node.targets)} = ..."
+
+def _outline_body(body: List[ast.stmt], depth: int, out: List[str]) -> None:
+    indent = "    " * depth
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            for decorator in node.decorator_list:
+                out.append(f"{indent}@{ast.unparse(decorator)}")
+            out.append(indent + _signature(node))
+            inner = indent + "    "
+            start = len(out)
+            doc = ast.get_docstring(node)
+            if doc:
+                out.append(_docstring_line(doc, inner, first_line_only=True))
+            if isinstance(node, ast.ClassDef):
+                _outline_body(node.body, depth + 1, out)
+            if len(out) == start:
+                out.append(inner + "...")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            out.append(indent + _assignment(node))
+
+def outline_python(text: str) -> Optional[str]:
+    """Module docstring, class/function signatures (with first docstring lines) and assignments."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    out: List[str] = []
+    doc = ast.get_docstring(tree, clean=False)
+    if doc:
+        out.append(_docstring_line(doc, "", first_line_only=False))
+    _outline_body(tree.body, 0, out)
+    return "\n".join(out)
+
+def outline_declarations(text: str, language: str) -> str:
+    """Regex fallback: keep lines that look like declarations, without their opening brace."""
+    pattern = _COMPILED[language]
+    out = []
+    for line in text.split("\n"):
+        if pattern.match(line):
+            out.append(line.rstrip().rstrip('{').rstrip())
+    return "\n".join(out)
+
+def outline(rel_path: str, text: str) -> Optional[str]:
+    """Outline ``text`` by file type; None when the type has no outline rules."""
+    ext = os.path.splitext(rel_path)[1].lower()
+    if ext in ('.py', '.pyi'):
+        result = outline_python(text)
+        # Fall back to the declaration regexes for files that do not parse
+        return result if result is not None else outline_declarations(text, 'python')
+    language = _LANGUAGES.get(ext)
+    if language is None:
+        return None
+    return outline_declarations(text, language)
+
+class Outliner:
+    """Replace file contents with outlines, except for files promoted to full content.
+
+    Outlines are stored in the content cache keyed by (size, mtime_ns, inode),
+    so files whose outline is cached are not even read. Line-range specs and
+    files matching a ``full`` pattern are always packed in full. Files over the
+    reader's ``SizePolicy`` limit are outlined from the sampled text, keep its
+    skip or truncation notice and, like partial reads, are never cached.
+    """
+
+    def __init__(self, cache: Optional[ContentCache] = None, meta: Optional[Dict] = None,
+                 full: Sequence[str] = ()):
+        self.cache = cache
+        self.meta = meta or {}
+        self.full = list(full)
+        self.outlined = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def is_full(self, spec: str) -> bool:
+        path, line_range = parse_line_range(spec)
+        return line_range is not None or any(fnmatch.fnmatch(path, p) for p in self.full)
+
+    def _cached(self, spec: str, key) -> Optional[str]:
+        if self.cache is None or key is None:
+            return None
+        return self.cache.lookup_outline(spec, key, OUTLINE_VERSION)
+
+    def _outline(self, spec: str, content: str, key, limited: bool = False) -> str:
+        result = profiler.timed('outline', outline)(spec, content)
+        if result is None:
+            return content
+        if limited:
+            # Outlining drops the notice about what the size policy left out, so put it back
+            return "\n".join(part for part in [result, *LIMIT_NOTICE_RE.findall(content)] if part)
+        if self.cache is not None and key is not None:
+            self.cache.store_outline(spec, key, OUTLINE_VERSION, result)
+        return result
+
+    def _record(self, size: int, result: str) -> None:
+        self.outlined += 1
+        self.bytes_before += size
+        self.bytes_after += len(result)
+
+    def read(self, reader, specs: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """Like ``reader.read(specs)``, but cached outlines are served without reading the file."""
+        specs = list(specs)
+        # Keys come from the reader, which re-stats when the snapshot may be stale
+        keys = {spec: reader.key(spec) for spec in specs if not self.is_full(spec)}
+        limited = {spec for spec, key in keys.items()
+                   if key is not None and reader.policy.applies_to(key[0])}
+        cached = {}
+        for spec, key in keys.items():
+            result = self._cached(spec, key) if spec not in limited else None
+            if result is not None:
+                cached[spec] = result
+        misses = reader.read(spec for spec in specs if spec not in cached)
+        for spec in specs:
+            if spec in cached:
+                info = self.meta.get(spec)
+                self._record(info.size if info else len(cached[spec]), cached[spec])
+                yield spec, cached[spec]
+                continue
+            _, content = next(misses)
+            if content is None or self.is_full(spec):
+                yield spec, content
+                continue
+            result = self._outline(spec, content, keys.get(spec), spec in limited)
+            if result is not content:
+                self._record(len(content), result)
+            yield spec, result
+
+    def summary(self) -> str:
+        ratio = self.bytes_before / self.bytes_after if self.bytes_after else 0
+        return (f"Outlined {self.outlined} files: {self.bytes_before} -> {self.bytes_after} bytes"
+                + (f" ({ratio:.1f}x smaller)" if ratio else ""))
@@ -0,0 +1,305 @@
+import io
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+from . import profiler
+from .minify import Minifier
+from .outline import Outliner
+from .token_budget import TokenBudget, estimate_tokens, plan_files
+
+class PackWriter:
+    """Incrementally write a pack to a file, stdout or the clipboard.
+
+    Top-level sections are separated by a blank line and file blocks are
+    written as soon as their contents are available, so a file or stdout sink
+    only ever holds one file's text in memory. The clipboard sink has to
+    buffer the whole pack because ``pyperclip.copy`` takes a single string.
+    """
+
+    def __init__(self, out: Optional[str] = None):
+        self.out = out
+        self.chars_written = 0
+        self._sections = 0
+        self._in_files = False
+        if out is None:
+            self.sink: TextIO = io.StringIO()
+        elif out == '-':
+            self.sink = sys.stdout
+        else:
+            self.sink = open(out, 'w', encoding='utf-8')
+
+    @property
+    def to_clipboard(self) -> bool:
+        return self.out is None
+
+    @property
+    def to_stdout(self) -> bool:
+        return self.out == '-'
+
+    @property
+    def path(self) -> Optional[str]:
+        """The file being written, or None for the clipboard and stdout."""
+        return None if self.to_clipboard or self.to_stdout else self.out
+
+    def _write(self, text: str) -> None:
+        self.sink.write(text)
+        self.chars_written += len(text)
+
+    def write_section(self, text: str) -> None:
+        if self._sections:
+            self._write("\n\n")
+        self._write(text)
+        self._sections += 1
+
+    def begin_files(self, tag: str = "project-files") -> None:
+        self.write_section(f"<{tag}>")
+        self._in_files = tag
+
+    def write_file(self, rel_path: str, content: str) -> None:
+        self._write(f"\n```{rel_path}\n{content}\n```")
+
+    def end_files(self) -> None:
+        self._write(f"\n</{self._in_files}>")
+        self._in_files = False
+
+    def close(self) -> None:
+        if self.to_clipboard:
+            import pyperclip
+            with profiler.phase("clipboard"):
+                pyperclip.copy(self.sink.getvalue())
+        elif self.to_stdout:
+            self.sink.flush()
+        else:
+            self.sink.close()
+
+    def describe(self) -> str:
+        if self.to_clipboard:
+            return "clipboard"
+        if self.to_stdout:
+            return "stdout"
+        return self.out
+
+    def __enter__(self) -> 'PackWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif not self.to_clipboard and not self.to_stdout:
+            self.sink.close()
+
+PARTS_DIR = os.path.join('prompting', 'cli', 'parts')
+
+def parts_dir(project_dir: str) -> str:
+    return os.path.join(project_dir, PARTS_DIR)
+
+def part_path(project_dir: str, number: int) -> str:
+    return os.path.join(parts_dir(project_dir), f"part-{number:02d}.txt")
+
+def list_parts(project_dir: str) -> List[str]:
+    """Part files from the last split pack, in order."""
+    directory = parts_dir(project_dir)
+    if not os.path.isdir(directory):
+        return []
+    # Numbers are only padded to two digits, so part-100 must not sort before part-11
+    numbered = [(int(match.group(1)), name) for name in os.listdir(directory)
+                for match in [re.fullmatch(r'part-(\d+)\.txt', name)] if match]
+    return [os.path.join(directory, name) for _, name in sorted(numbered)]
+
+class SplitPackWriter:
+    """Same interface as ``PackWriter``, but partitions the pack into size-capped parts.
+
+    File blocks are split at file boundaries so that each part stays under
+    ``max_tokens`` and/or ``max_bytes``; a single file larger than the cap gets
+    a part of its own. Every part starts with a ``<pack-part>`` header saying
+    where it belongs, and the other sections (structure, context) only go into
+    part 1. Parts are written to ``prompting/cli/parts/`` when the writer is
+    closed and part 1 is copied to the clipboard.
+    """
+
+    def __init__(self, project_dir: str, max_tokens: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.project_dir = project_dir
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.chars_written = 0
+        self.parts: List[str] = []
+        self.oversized: List[str] = []
+        self._tag: Optional[str] = None
+        self._groups: List[List[Tuple[str, str]]] = []
+        self._blocks: List[Tuple[str, str]] = []
+        self._sections: List[str] = []
+
+    to_clipboard = False
+    to_stdout = False
+    path = None
+
+    def _size(self, text: str) -> Tuple[int, int]:
+        return (estimate_tokens(text) if self.max_tokens else 0,
+                len(text.encode('utf-8')) if self.max_bytes else 0)
+
+    def _fits(self, used: Tuple[int, int], size: Tuple[int, int]) -> bool:
+        return ((not self.max_tokens or used[0] + size[0] <= self.max_tokens)
+                and (not self.max_bytes or used[1] + size[1] <= self.max_bytes))
+
+    def write_section(self, text: str) -> None:
+        self._sections.append(text)
+        self.chars_written += len(text)
+
+    def begin_files(self, tag: str = "project-files") -> None:
+        self._tag = tag
+
+    def write_file(self, rel_path: str, content: str) -> None:
+        block = f"\n```{rel_path}\n{content}\n```"
+        self._blocks.append((rel_path, block))
+        self.chars_written += len(block)
+
+    def end_files(self) -> None:
+        pass
+
+    def _overhead(self) -> Tuple[int, int]:
+        """Largest size of a part with no files: its header plus the files wrapper."""
+        # Numbers as wide as the most parts there can be, in every header variant
+        widest = int('9' * len(str(max(len(self._blocks), 1))))
+        sizes = [self._size(self._render(number, total, [], sections=False))
+                 for number, total in ((1, widest), (2, widest), (widest, widest))]
+        return max(size[0] for size in sizes), max(size[1] for size in sizes)
+
+    def _partition(self) -> List[List[Tuple[str, str]]]:
+        overhead = self._overhead()
+        # Part 1 also carries the other sections, so it has less room for files
+        used = overhead
+        if self._sections:
+            used = self._add(used, self._size("\n\n" + "\n\n".join(self._sections)))
+        groups: List[List[Tuple[str, str]]] = [[]]
+        for rel_path, block in self._blocks:
+            size = self._size(block)
+            if groups[-1] and not self._fits(used, size):
+                groups.append([])
+                used = overhead
+            groups[-1].append((rel_path, block))
+            used = self._add(used, size)
+        return groups
+
+    @staticmethod
+    def _add(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+        return a[0] + b[0], a[1] + b[1]
+
+    def _render(self, number: int, total: int, blocks: List[Tuple[str, str]], sections: bool = True) -> str:
+        where = ("This part holds the project structure and context." if number == 1 else
+                 "The project structure and context are in part 1.")
+        after = "All parts have been sent." if number == total else "Wait for all parts before answering."
+        rendered = [
+            f"<pack-part number=\"{number}\" total=\"{total}\" description=\"Part {number} of {total} "
+            f"of one project pack, split at file boundaries. {where} {after}\" />"
+        ]
+        if self._tag is not None:
+            rendered.append(f"<{self._tag}>{''.join(block for _, block in blocks)}\n</{self._tag}>")
+        if number == 1 and sections:
+            rendered.extend(self._sections)
+        return "\n\n".join(rendered)
+
+    def close(self) -> None:
+        groups = self._partition()
+        while True:
+            self.parts = [self._render(i, len(groups), blocks) for i, blocks in enumerate(groups, 1)]
+            # Token estimates of the joined text can exceed the sum of the pieces;
+            # push the last file of any part that ended up over the cap into the next one
+            over = next((i for i, (text, blocks) in enumerate(zip(self.parts, groups))
+                         if len(blocks) > 1 and not self._fits((0, 0), self._size(text))), None)
+            if over is None:
+                break
+            if over + 1 == len(groups):
+                groups.append([])
+            groups[over + 1].insert(0, groups[over].pop())
+        self._groups = groups
+        self.oversized = [blocks[0][0] for text, blocks in zip(self.parts, groups)
+                          if blocks and not self._fits((0, 0), self._size(text))]
+        os.makedirs(parts_dir(self.project_dir), exist_ok=True)
+        for stale in list_parts(self.project_dir):
+            os.remove(stale)
+        for number, text in enumerate(self.parts, 1):
+            with open(part_path(self.project_dir, number), 'w', encoding='utf-8') as f:
+                f.write(text)
+        import pyperclip
+        with profiler.phase("clipboard"):
+            pyperclip.copy(self.parts[0])
+
+    def report(self) -> List[str]:
+        lines = []
+        for number, (text, blocks) in enumerate(zip(self.parts, self._groups), 1):
+            lines.append(f"part {number:2d}: {len(blocks):5d} files {estimate_tokens(text):9d} tokens "
+                         f"{len(text.encode('utf-8')):10d} bytes")
+        overhead = self._overhead()
+        if not self._fits((0, 0), overhead):
+            needs = " and ".join(([f"~{overhead[0]} tokens"] if self.max_tokens else [])
+                                 + ([f"{overhead[1]} bytes"] if self.max_bytes else []))
+            lines.append(f"Warning: each part's header alone takes {needs}, so no part fits the cap")
+        for rel_path in self.oversized:
+            lines.append(f"Warning: {rel_path} alone exceeds the part size and has a part of its own")
+        return lines
+
+    def describe(self) -> str:
+        return (f"{PARTS_DIR} ({len(self.parts)} parts, part 1 copied to clipboard; "
+                f"run 'capi again --part 2' for the next)" if len(self.parts) > 1 else
+                f"{PARTS_DIR} (1 part, copied to clipboard)")
+
+    def __enter__(self) -> 'SplitPackWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+def open_pack_writer(project_dir: str, out: Optional[str] = None, split_tokens: Optional[int] = None,
+                     split_bytes: Optional[int] = None):
+    """A ``SplitPackWriter`` when a part size is given, otherwise a ``PackWriter`` for ``out``."""
+    if split_tokens or split_bytes:
+        return SplitPackWriter(project_dir, max_tokens=split_tokens, max_bytes=split_bytes)
+    return PackWriter(out)
+
+def write_files(writer, files: Sequence[str], make_reader: Callable, meta: Dict, cache=None,
+                budget: Optional[TokenBudget] = None, selected: Optional[Sequence[str]] = None,
+                outline: bool = False, full: Sequence[str] = (), minify: bool = False,
+                echo: Callable[[str], None] = print, tag: str = "project-files"):
+    """Write ``files`` to ``writer`` as one files section, outlined, minified and budgeted.
+
+    ``make_reader`` returns a fresh ``ParallelFileReader``. With a ``budget``
+    (whose overhead covers the pack's other sections) the files are read and
+    transformed once to plan which of them fit, preferring ``selected``, and the
+    last one may be cut short. Reports go to ``echo``. Returns the reader that
+    produced the written contents, the paths written and the truncated paths.
+    """
+    plan = None
+    if budget is not None:
+        with profiler.phase("budget"):
+            reader = make_reader()
+            results = Outliner(cache, meta, full).read(reader, files) if outline else reader.read(files)
+            # Plan with the transformed sizes, since that is what ends up in the pack
+            plan = plan_files(Minifier().transform(results) if minify else results, meta, budget,
+                              selected=files if selected is None else selected)
+        for line in plan.report():
+            echo(line)
+        files = plan.paths
+
+    writer.begin_files(tag)
+    reader = make_reader()
+    outliner = Outliner(cache, meta, full) if outline else None
+    minifier = Minifier() if minify else None
+    results = outliner.read(reader, files) if outliner else reader.read(files)
+    write_file = profiler.timed("format", writer.write_file)
+    with profiler.phase("files"):
+        for file, content in minifier.transform(results) if minifier else results:
+            if content is not None:
+                write_file(file, plan.fit(file, content) if plan else content)
+            else:
+                print(f"Error reading file: {file}", file=sys.stderr)
+    writer.end_files()
+
+    if outliner:
+        echo(outliner.summary())
+    if minifier:
+        for line in minifier.report():
+            echo(line)
+    return reader, files, plan.truncated_paths if plan else []
@@ -0,0 +1,149 @@
+import heapq
+import re
+from bisect import bisect_right
+from itertools import islice
+from typing import List, Optional, Sequence, Tuple
+
+# Ranked matches returned by default; the tree stays usable for very broad queries
+DEFAULT_LIMIT = 2000
+# The fuzzy fallback ranks at most this many times ``limit`` matches, the shortest paths first
+FUZZY_SCAN_FACTOR = 4
+# Characters that start a new word in a file name, and the marker put after them
+WORD_SEPARATORS = '._-'
+_WORD_MARK = '\x01'
+
+def _mark_words(name: str) -> str:
+    """``name`` with a marker after each separator, so word starts can be found literally."""
+    for sep in WORD_SEPARATORS:
+        name = name.replace(sep, sep + _WORD_MARK)
+    return name
+
+def _fuzzy_pattern(query: str) -> 're.Pattern':
+    """The query characters in order within one line; group 1 is the matched span.
+
+    Each gap skips only characters other than the next one wanted, so a
+    match never backtracks, and the rest of the line is consumed so each
+    line matches at most once.
+    """
+    gaps = ''.join(f"[^\\n{re.escape(ch)}]*{re.escape(ch)}" for ch in query[1:])
+    return re.compile('(' + re.escape(query[0]) + gaps + ')[^\\n]*')
+
+def score(path: str, query: str, span: Optional[int] = None) -> float:
+    """Higher is better: basename substring, then path substring, then tight subsequences."""
+    name_start = path.rfind('/') + 1
+    if query in path[name_start:]:
+        base = 3000.0
+        # Prefix of the file name, or the start of a word in it
+        at = path.find(query, name_start)
+        while at != -1:
+            if at == name_start or path[at - 1] in WORD_SEPARATORS:
+                base += 500
+                break
+            at = path.find(query, at + 1)
+    elif query in path:
+        base = 2000.0
+    else:
+        span = len(path) if span is None else span
+        base = 1000.0 - (span - len(query)) * 10
+    return base - len(path) / 100
+
+class PathIndex:
+    """In-memory fuzzy path search that narrows incrementally as the query grows.
+
+    Paths are lowercased and joined into one newline-separated string, so a
+    search is a single regex scan in C rather than a Python loop per path.
+    Fuzzy scans go shortest path first and stop once they have enough
+    candidates to rank. When a query extends the previous one its matches
+    must be among the previous matches or the paths that scan never
+    reached, so only those are scanned again.
+
+    Literal matches rank in tiers (word start in the file name, anywhere in
+    the file name, anywhere in the path), shorter paths first within a tier.
+    Both the paths and their file names are also joined shortest first, so
+    the best ``limit`` literal matches are the first ones each scan finds
+    and the scan stops there.
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        self.paths = list(paths)
+        self._lower = [p.lower() for p in self.paths]
+        # Previous fuzzy query, the ranks it matched and the rank its scan stopped at
+        self._last: Optional[Tuple[str, List[int], int]] = None
+        self._by_length = sorted(range(len(self.paths)), key=lambda i: len(self.paths[i]))
+        self._short_blob, self._short_starts = self._join(self._by_length)
+        names = "\n".join(_WORD_MARK + self._lower[i].rpartition('/')[2] for i in self._by_length)
+        self._names = _mark_words(names)
+        self._name_starts = [0] + [m.end() for m in re.finditer('\n', self._names)]
+
+    def _join(self, ids) -> Tuple[str, List[int]]:
+        starts, parts, offset = [], [], 0
+        for i in ids:
+            starts.append(offset)
+            parts.append(self._lower[i])
+            offset += len(self._lower[i]) + 1
+        return "\n".join(parts), starts
+
+    def _scan(self, pattern, blob: str, starts: List[int], ranks: Sequence[int], pos: int = 0,
+              cap: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(rank, matched span length) for the first ``cap`` lines from ``pos`` matching ``pattern``."""
+        return [(ranks[bisect_right(starts, m.start()) - 1], m.end(1) - m.start(1))
+                for m in islice(pattern.finditer(blob, pos), cap)]
+
+    def matches(self, query: str, cap: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(id, span) of paths containing the query characters in order, shortest first.
+
+        At most ``cap`` are returned. Paths are referred to by their rank in
+        shortest-first order internally, so a capped scan can be resumed.
+        """
+        query = query.lower()
+        pattern = _fuzzy_pattern(query)
+        if self._last is not None and query.startswith(self._last[0]):
+            _, ranks, resume = self._last
+            blob, starts = self._join(self._by_length[r] for r in ranks)
+            found = self._scan(pattern, blob, starts, ranks, cap=cap)
+        else:
+            found, resume = [], 0
+        if resume < len(self.paths) and (cap is None or len(found) < cap):
+            # The previous scan stopped here, so the rest of the paths are all candidates
+            found += self._scan(pattern, self._short_blob, self._short_starts, range(len(self.paths)),
+                                self._short_starts[resume], None if cap is None else cap - len(found))
+        # Anything ranked after the last match of a capped scan has not been looked at
+        resume = found[-1][0] + 1 if found and len(found) == cap else len(self.paths)
+        self._last = (query, [r for r, _ in found], resume)
+        return [(self._by_length[r], span) for r, span in found]
+
+    def literal(self, query: str, limit: int) -> List[int]:
+        """Ids of the best ``limit`` paths containing ``query``, best first."""
+        marked = _mark_words(query)
+        tiers = [(self._names, self._name_starts, _WORD_MARK + marked),
+                 (self._names, self._name_starts, marked),
+                 (self._short_blob, self._short_starts, query)]
+        best: List[int] = []
+        seen = set()
+        for blob, starts, needle in tiers:
+            for m in re.finditer(re.escape(needle), blob):
+                rank = bisect_right(starts, m.start()) - 1
+                if rank not in seen:
+                    seen.add(rank)
+                    best.append(self._by_length[rank])
+                    if len(best) == limit:
+                        return best
+        return best
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """Best ``limit`` paths for ``query``, best first.
+
+        When some paths contain the query as typed only those are returned;
+        scattered subsequence matches are the fallback for queries that
+        match nothing literally. That fallback ranks the first
+        ``FUZZY_SCAN_FACTOR * limit`` matches, shortest paths first.
+        """
+        if not query:
+            return []
+        query = query.lower()
+        literal = self.literal(query, limit)
+        if literal:
+            return [self.paths[i] for i in literal]
+        best = heapq.nlargest(limit, self.matches(query, limit * FUZZY_SCAN_FACTOR),
+                              key=lambda item: score(self._lower[item[0]], query, item[1]))
+        return [self.paths[i] for i, _ in best]
@@ -0,0 +1,175 @@
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+@dataclass
+class PhaseStats:
+    name: str
+    depth: int
+    calls: int = 0
+    seconds: float = 0.0
+    peak_bytes: int = 0  # tracemalloc peak above the memory in use when the phase started
+
+@dataclass
+class _Frame:
+    key: str
+    start_bytes: int
+    peak_bytes: int
+
+class Profiler:
+    """Per-phase wall time, call counts and memory for one capi invocation.
+
+    ``phase`` blocks nest, and memory is attributed with tracemalloc peaks
+    that are folded into the enclosing phase on exit. ``timed`` wraps hot
+    per-file calls (ignore matching, binary detection, reads) and only
+    records time and counts, since tracemalloc bookkeeping per call would
+    dwarf the call itself.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.phases: Dict[str, PhaseStats] = {}
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._main_stack = self._stack()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self) -> List[_Frame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _stats(self, name: str, stack: List[_Frame]) -> PhaseStats:
+        key = f"{stack[-1].key}/{name}" if stack else name
+        stats = self.phases.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self.phases.setdefault(key, PhaseStats(name=name, depth=len(stack)))
+        return stats
+
+    @contextmanager
+    def phase(self, name: str):
+        stack = self._stack()
+        stats = self._stats(name, stack)
+        tracing = self.trace_memory and threading.current_thread() is threading.main_thread()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_bytes = max(stack[-1].peak_bytes, peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        frame = _Frame(key=f"{stack[-1].key}/{name}" if stack else name,
+                       start_bytes=current, peak_bytes=current)
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                stats.calls += 1
+                stats.seconds += elapsed
+            if tracing:
+                frame.peak_bytes = max(frame.peak_bytes, tracemalloc.get_traced_memory()[1])
+                stats.peak_bytes = max(stats.peak_bytes, frame.peak_bytes - frame.start_bytes)
+                if stack:
+                    stack[-1].peak_bytes = max(stack[-1].peak_bytes, frame.peak_bytes)
+                tracemalloc.reset_peak()
+
+    def timed(self, name: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                # Worker threads (e.g. parallel reads) count under the phase the main thread is in
+                stack = self._stack() or self._main_stack
+                stats = self._stats(name, stack)
+                with self._lock:
+                    stats.calls += 1
+                    stats.seconds += elapsed
+        return wrapper
+
+    def stop(self) -> None:
+        self.elapsed = time.perf_counter() - self.started
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @staticmethod
+    def peak_rss() -> Optional[int]:
+        if resource is None:
+            return None
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+    def report(self) -> Dict:
+        return {
+            "elapsed": self.elapsed,
+            "peak_rss": self.peak_rss(),
+            "phases": [{"path": key, **asdict(stats)} for key, stats in self.phases.items()],
+        }
+
+    def table(self) -> List[str]:
+        total = max(self.elapsed, 1e-9)
+        lines = [f"{'phase':<34} {'calls':>8} {'ms':>10} {'%':>6} {'peak MB':>9}"]
+        for stats in self.phases.values():
+            label = "  " * stats.depth + stats.name
+            memory = f"{stats.peak_bytes / 1_048_576:9.2f}" if stats.peak_bytes else f"{'-':>9}"
+            lines.append(f"{label:<34} {stats.calls:>8} {stats.seconds * 1000:>10.1f} "
+                         f"{stats.seconds / total:>6.1%} {memory}")
+        rss = self.peak_rss()
+        lines.append(f"Total {self.elapsed * 1000:.1f} ms"
+                     + (f", peak RSS {rss / 1_048_576:.1f} MB" if rss else ""))
+        return lines
+
+    def dump_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+# The profiler for this process, set by ``capi --profile``
+_active: Optional[Profiler] = None
+
+def start(trace_memory: bool = True) -> Profiler:
+    global _active
+    _active = Profiler(trace_memory)
+    return _active
+
+def stop() -> Optional[Profiler]:
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+@contextmanager
+def phase(name: str):
+    """Record a phase when profiling is on; a plain no-op otherwise."""
+    if _active is None:
+        yield
+        return
+    with _active.phase(name):
+        yield
+
+def timed(name: str, fn: Callable) -> Callable:
+    """Return ``fn`` wrapped to count calls and time when profiling is on, else ``fn`` itself."""
+    return fn if _active is None else _active.timed(name, fn)
@@ -0,0 +1,143 @@
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .content_cache import CACHE_DIR
+
+INDEX_FILE = 'search.sqlite3'
+# Bump when tokenisation changes so the index is rebuilt
+INDEX_VERSION = 1
+K1 = 1.2
+B = 0.75
+# Path components say a lot about a file, so they count as this many occurrences
+PATH_WEIGHT = 3
+
+_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9]*|\d+')
+_CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+_STOPWORDS = frozenset(
+    'the a an and or of to in is it for on with as be by this that from at are was if not '
+    'self def return import none true false'.split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words, with identifiers also split on camelCase and snake_case."""
+    terms = []
+    for word in _WORD_RE.findall(text.replace('_', ' ')):
+        parts = _CAMEL_RE.findall(word)
+        if len(parts) > 1:
+            terms.append(word.lower())
+        terms.extend(p.lower() for p in parts)
+    return [t for t in terms if len(t) > 1 and t not in _STOPWORDS]
+
+def _document_terms(rel_path: str, text: str) -> Counter:
+    terms = Counter(tokenize(text))
+    for term in tokenize(rel_path):
+        terms[term] += PATH_WEIGHT
+    return terms
+
+class RelevanceIndex:
+    """Incrementally updated BM25 inverted index over the project's text files.
+
+    Stored in ``prompting/cli/cache/search.sqlite3`` (in memory when the
+    project has not been initialised). Documents are keyed by (size,
+    mtime_ns, inode) like the content cache, so ``update`` only re-indexes
+    files that changed since the last run.
+    """
+
+    def __init__(self, project_dir: str):
+        cli_dir = os.path.join(project_dir, 'prompting', 'cli')
+        if os.path.isdir(cli_dir):
+            cache_dir = os.path.join(project_dir, CACHE_DIR)
+            os.makedirs(cache_dir, exist_ok=True)
+            self.conn = sqlite3.connect(os.path.join(cache_dir, INDEX_FILE))
+        else:
+            self.conn = sqlite3.connect(':memory:')
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS docs")
+            self.conn.execute("DROP TABLE IF EXISTS postings")
+            self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, length INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT, path TEXT, tf INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings (term)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_path ON postings (path)")
+
+    def update(self, key: Callable[[str], Optional[Tuple[int, int, int]]], files: Iterable[str],
+               read: Callable[[List[str]], Iterable[Tuple[str, Optional[str]]]]) -> Tuple[int, int]:
+        """Bring the index in line with ``files``; ``read`` yields (path, text) for stale ones.
+
+        ``key`` gives a file's current (size, mtime_ns, inode).
+
+        Returns the number of (re)indexed and removed documents.
+        """
+        keys = {path: key(path) for path in files}
+        known = {row[0]: tuple(row[1:]) for row in
+                 self.conn.execute("SELECT path, size, mtime_ns, inode FROM docs")}
+        stale = [path for path, k in keys.items() if k is None or known.get(path) != tuple(k)]
+        removed = [path for path in known if path not in keys]
+
+        doomed = [(path,) for path in removed + [p for p in stale if p in known]]
+        self.conn.executemany("DELETE FROM postings WHERE path = ?", doomed)
+        self.conn.executemany("DELETE FROM docs WHERE path = ?", doomed)
+
+        indexed = 0
+        for path, text in read(stale):
+            if text is None or keys[path] is None:
+                continue
+            terms = _document_terms(path, text)
+            self.conn.execute(
+                "INSERT INTO docs (path, size, mtime_ns, inode, length) VALUES (?, ?, ?, ?, ?)",
+                (path, *keys[path], sum(terms.values()))
+            )
+            self.conn.executemany(
+                "INSERT INTO postings (term, path, tf) VALUES (?, ?, ?)",
+                [(term, path, tf) for term, tf in terms.items()]
+            )
+            indexed += 1
+        self.conn.commit()
+        return indexed, len(removed)
+
+    def search(self, query: str, top: int = 20) -> List[Tuple[str, float]]:
+        """Rank documents for ``query`` with BM25 and return the ``top`` (path, score) pairs."""
+        terms = set(tokenize(query))
+        n, total_length = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        if not terms or not n:
+            return []
+        avgdl = total_length / n
+        scores: Dict[str, float] = {}
+        for term in terms:
+            rows = self.conn.execute(
+                "SELECT p.path, p.tf, d.length FROM postings p JOIN docs d ON d.path = p.path"
+                " WHERE p.term = ?", (term,)
+            ).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for path, tf, length in rows:
+                norm = tf + K1 * (1 - B + B * length / avgdl)
+                scores[path] = scores.get(path, 0.0) + idf * tf * (K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'RelevanceIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def rank_files(project_dir: str, snapshot, query: str, top: int, reader) -> List[Tuple[str, float]]:
+    """Update the project's index from ``snapshot`` and return the best ``top`` files for ``query``.
+
+    ``reader`` is a ``ParallelFileReader`` that supplies the stale files' keys and contents.
+    """
+    with RelevanceIndex(project_dir) as index:
+        index.update(reader.key, snapshot.files, reader.read)
+        return index.search(query, top)
@@ -0,0 +1,37 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+def selection_path(project_dir: str) -> str:
+    return os.path.join(project_dir, 'prompting', 'cli', 'last_selection.json')
+
+def load_selection_data(project_dir: str) -> Optional[Dict]:
+    """Return the saved selection, or None if ``capi init`` has not been run."""
+    selection_file = selection_path(project_dir)
+    if not os.path.exists(selection_file):
+        return None
+    with open(selection_file, 'r') as f:
+        return json.load(f)
+
+def load_selection(project_dir: str) -> List[str]:
+    data = load_selection_data(project_dir)
+    return data.get("files", []) if data else []
+
+def save_selection(project_dir: str, files: List[str], manifest: Optional[Dict[str, str]] = None,
+                   tracked: Optional[Iterable[str]] = None) -> bool:
+    """Save the selection and its content-hash manifest if prompting/cli exists.
+
+    The manifest maps each file to the sha1 of the content that was copied,
+    which is what ``capi again --changed`` diffs against. Digests are kept
+    for ``tracked`` paths, which default to ``files``.
+    """
+    selection_file = selection_path(project_dir)
+    if not os.path.exists(os.path.dirname(selection_file)):
+        return False
+    data = {"files": files}
+    if manifest:
+        data["manifest"] = {path: manifest[path] for path in (files if tracked is None else tracked)
+                            if path in manifest}
+    with open(selection_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    return True
@@ -0,0 +1,224 @@
+import os
+import stat as stat_mode
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from . import profiler
+from .content_cache import ContentCache
+from .file_utils import BinaryClassifier
+from .git_index import list_git_files
+from .ignore_matcher import IgnoreMatcher
+from .token_budget import tokens_for_size
+
+@dataclass
+class FileInfo:
+    rel_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    is_binary: bool
+    # Token estimate from the cached text; None until the file has been read once
+    tokens: Optional[int] = None
+
+    @property
+    def key(self):
+        return (self.size, self.mtime_ns, self.inode)
+
+    @property
+    def estimated_tokens(self) -> int:
+        return self.tokens if self.tokens is not None else tokens_for_size(self.size)
+
+@dataclass
+class DirListing:
+    dirs: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+
+@dataclass
+class ProjectSnapshot:
+    """Filtered view of a project built from a single scandir traversal.
+
+    In a git checkout the file list comes from the git index instead
+    (tracked plus untracked-not-ignored files), which skips both the walk
+    and Python-side .gitignore matching; only ``ALWAYS_IGNORE`` is applied.
+    ``tree`` maps each relative directory ("" for the root) to its sorted,
+    non-ignored children; ``files`` lists every text file in sorted order and
+    ``meta`` keeps the stat info and binary classification gathered during the
+    walk so consumers never need to touch the filesystem again. ``progress``,
+    if given to ``scan``, is called with each file's ``FileInfo`` as it is
+    classified.
+    """
+    root: str
+    matcher: IgnoreMatcher
+    files: List[str] = field(default_factory=list)
+    dirs: List[str] = field(default_factory=list)
+    tree: Dict[str, DirListing] = field(default_factory=dict)
+    meta: Dict[str, FileInfo] = field(default_factory=dict)
+    # Set when the snapshot came from a ``capi serve`` daemon, which also serves contents
+    remote: Optional[object] = None
+
+    @classmethod
+    def scan(cls, root: str, matcher: Optional[IgnoreMatcher] = None,
+             cache: Optional[ContentCache] = None,
+             classifier: Optional[BinaryClassifier] = None,
+             use_git: bool = True,
+             progress: Optional[Callable[[FileInfo], None]] = None) -> 'ProjectSnapshot':
+        root = os.path.abspath(root)
+        snapshot = cls(root=root, matcher=matcher or IgnoreMatcher(root))
+        classifier = classifier or BinaryClassifier()
+        # A custom matcher can only be honoured by walking
+        git_files = list_git_files(root) if use_git and matcher is None else None
+        if git_files is not None:
+            snapshot._from_paths(git_files, cache, classifier, progress)
+        else:
+            snapshot._walk(cache, classifier, progress)
+        return snapshot
+
+    def _add_file(self, listing: DirListing, rel_path: str, name: str, full_path: str,
+                  stat: os.stat_result, cache: Optional[ContentCache],
+                  classifier: BinaryClassifier, is_binary_file,
+                  progress: Optional[Callable[[FileInfo], None]] = None) -> None:
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        cached = cache.lookup(rel_path, key) if cache else None
+        tokens = None
+        if cached is not None:
+            is_binary = cached.is_binary
+            tokens = cached.tokens
+            classifier.remember(full_path, is_binary)
+        else:
+            is_binary = is_binary_file(full_path)
+            if cache:
+                cache.store_classification(rel_path, key, is_binary)
+        info = self.meta[rel_path] = FileInfo(
+            rel_path=rel_path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            inode=stat.st_ino,
+            is_binary=is_binary,
+            tokens=tokens
+        )
+        if progress is not None:
+            progress(info)
+        listing.files.append(name)
+        if not is_binary:
+            self.files.append(rel_path)
+
+    def _add_dir(self, rel_dir: str, ignored: Set[str]) -> bool:
+        """Register ``rel_dir`` and its parents; False if any of them is always ignored."""
+        if rel_dir in self.tree:
+            return True
+        if rel_dir in ignored:
+            return False
+        parent, _, name = rel_dir.rpartition('/')
+        if not self._add_dir(parent, ignored) or self.matcher.always.match(rel_dir, True):
+            ignored.add(rel_dir)
+            return False
+        self.tree[parent].dirs.append(name)
+        self.tree[rel_dir] = DirListing()
+        self.dirs.append(rel_dir)
+        return True
+
+    def _from_paths(self, paths: Iterable[str], cache: Optional[ContentCache],
+                    classifier: BinaryClassifier,
+                    progress: Optional[Callable[[FileInfo], None]] = None) -> None:
+        is_binary_file = profiler.timed('binary detection', classifier.is_binary)
+        self.tree[''] = DirListing()
+        ignored: Set[str] = set()
+        for rel_path in paths:
+            rel_dir, _, name = rel_path.rpartition('/')
+            if not self._add_dir(rel_dir, ignored) or self.matcher.always.match(rel_path, False):
+                continue
+            full_path = self.full_path(rel_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue  # Deleted from the worktree but still in the index
+            # Submodules and symlinks to directories are listed too; keep regular files only
+            if not stat_mode.S_ISREG(stat.st_mode):
+                continue
+            self._add_file(self.tree[rel_dir], rel_path, name, full_path, stat, cache,
+                           classifier, is_binary_file, progress)
+
+        for listing in self.tree.values():
+            listing.dirs.sort()
+            listing.files.sort()
+        self.files.sort()
+        self.dirs.sort()
+
+    def _walk(self, cache: Optional[ContentCache], classifier: BinaryClassifier,
+              progress: Optional[Callable[[FileInfo], None]] = None) -> None:
+        match = profiler.timed('ignore matching', self.matcher.match)
+        is_binary_file = profiler.timed('binary detection', classifier.is_binary)
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            listing = DirListing()
+            self.tree[rel_dir] = listing
+            try:
+                with os.scandir(os.path.join(self.root, rel_dir) if rel_dir else self.root) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"Error accessing {rel_dir or self.root}: {e}", file=sys.stderr)
+                continue
+
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if match(rel_path, is_dir):
+                    continue
+
+                if is_dir:
+                    listing.dirs.append(entry.name)
+                    self.dirs.append(rel_path)
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    self._add_file(listing, rel_path, entry.name, entry.path, entry.stat(),
+                                   cache, classifier, is_binary_file, progress)
+
+        self.files.sort()
+        self.dirs.sort()
+
+    def to_dict(self) -> Dict:
+        return {
+            "root": self.root,
+            "files": self.files,
+            "dirs": self.dirs,
+            "tree": {rel_dir: [listing.dirs, listing.files] for rel_dir, listing in self.tree.items()},
+            "meta": {path: [i.size, i.mtime_ns, i.inode, i.is_binary, i.tokens]
+                     for path, i in self.meta.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, matcher: Optional[IgnoreMatcher] = None) -> 'ProjectSnapshot':
+        return cls(
+            root=data["root"],
+            matcher=matcher or IgnoreMatcher(data["root"]),
+            files=data["files"],
+            dirs=data["dirs"],
+            tree={rel_dir: DirListing(dirs, files) for rel_dir, (dirs, files) in data["tree"].items()},
+            meta={path: FileInfo(path, *fields) for path, fields in data["meta"].items()},
+        )
+
+    def discard(self, path: str) -> None:
+        """Drop the file at ``path`` (absolute or relative to the cwd) if the snapshot lists it."""
+        rel_path = os.path.relpath(os.path.realpath(path), os.path.realpath(self.root))
+        if rel_path.startswith(os.pardir):
+            return
+        rel_path = rel_path.replace(os.sep, '/')
+        if self.meta.pop(rel_path, None) is None:
+            return
+        if rel_path in self.files:
+            self.files.remove(rel_path)
+        parent, _, name = rel_path.rpartition('/')
+        listing = self.tree.get(parent)
+        if listing is not None and name in listing.files:
+            listing.files.remove(name)
+
+    def full_path(self, rel_path: str) -> str:
+        return os.path.join(self.root, *rel_path.split('/'))
+
+    def is_text_file(self, rel_path: str) -> bool:
+        info = self.meta.get(rel_path)
+        return info is not None and not info.is_binary
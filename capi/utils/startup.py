@@ -0,0 +1,74 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# Flag handled by the group itself; stripped before re-running the command
+STARTUP_PROFILE_FLAG = '--startup-profile'
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Runs the CLI exactly like the console script, so the profile covers capi.cli too
+_CHILD_CODE = "import sys; sys.argv[0] = 'capi'; from capi.cli import main; main()"
+
+@dataclass
+class ImportRecord:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split('.')[0]
+
+def parse_importtime(stderr: str) -> Tuple[List[ImportRecord], List[str]]:
+    """Split ``-X importtime`` output into import records and the command's own stderr lines."""
+    records, other = [], []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+        elif not line.startswith('import time:'):
+            other.append(line)
+    return records, other
+
+def run_with_importtime(args: Sequence[str]) -> Tuple[List[ImportRecord], List[str], float, int]:
+    """Run ``capi args`` under ``python -X importtime``; stdout passes straight through.
+
+    Returns the import records, the command's other stderr lines, the wall
+    time in seconds and the exit code.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD_CODE, *args],
+                            stderr=subprocess.PIPE, text=True, env=env)
+    wall = time.perf_counter() - start
+    records, other = parse_importtime(result.stderr)
+    return records, other, wall, result.returncode
+
+def startup_report(records: List[ImportRecord], wall: float, top: int = 15) -> List[str]:
+    """Slowest imports by cumulative time, and self time summed per top-level package."""
+    # Top-level records include everything they imported, so they add up to the total
+    total_us = sum(r.cumulative_us for r in records if r.depth == 0)
+    lines = [f"Wall time {wall * 1000:.1f} ms, imports {total_us / 1000:.1f} ms "
+             f"({len(records)} modules)", "",
+             f"{'cumulative ms':>13} {'self ms':>8}  slowest imports"]
+    for r in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{r.cumulative_us / 1000:>13.1f} {r.self_us / 1000:>8.1f}  {'  ' * r.depth}{r.module}")
+
+    by_package = defaultdict(lambda: [0, 0])
+    for r in records:
+        by_package[r.package][0] += r.self_us
+        by_package[r.package][1] += 1
+    lines += ["", f"{'ms':>13} {'modules':>8}  by package"]
+    for package, (self_us, count) in sorted(by_package.items(), key=lambda item: -item[1][0])[:top]:
+        lines.append(f"{self_us / 1000:>13.1f} {count:>8}  {package}")
+    return lines
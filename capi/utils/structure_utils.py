@@ -1,66 +1,123 @@
 import os
-from typing import Dict, List, Union
-from .file_utils import should_ignore, is_binary_file
+from typing import Dict, List, Optional, Tuple, Union
+from . import profiler
+from .snapshot import ProjectSnapshot
 
-def generate_json_structure(startpath: str, ignore_patterns: List[str], always_ignore: List[str]) -> Dict:
-    structure = {"files": [], "directories": {}}
+def _join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+def _count(n: int, singular: str, plural: str, more: bool) -> str:
+    return f"{n} {'more ' if more else ''}{singular if n == 1 else plural}"
+
+def _more_label(dirs: int, files: int, more: bool = True) -> str:
+    parts = []
+    if dirs:
+        parts.append(_count(dirs, "directory", "directories", more))
+    if files:
+        parts.append(_count(files, "file", "files", more))
+    return "… " + " and ".join(parts)
+
+def generate_json_structure(snapshot: ProjectSnapshot, max_depth: Optional[int] = None,
+                            max_entries: Optional[int] = None) -> Dict:
+    root: Dict = {}
+    # Iterative traversal so deep trees cannot hit the recursion limit
+    stack: List[Tuple[str, Dict, int]] = [("", root, 1)]
     
-    for item in os.listdir(startpath):
-        item_path = os.path.join(startpath, item)
-        rel_path = os.path.relpath(item_path, startpath)
+    while stack:
+        rel_dir, structure, depth = stack.pop()
+        listing = snapshot.tree[rel_dir]
+        files = [item for item in listing.files if snapshot.is_text_file(_join(rel_dir, item))]
+        dirs = listing.dirs
         
-        if not should_ignore(rel_path, ignore_patterns + always_ignore):
-            if os.path.isfile(item_path):
-                if not is_binary_file(item_path):
-                    structure["files"].append(item)
-            elif os.path.isdir(item_path):
-                structure["directories"][item] = generate_json_structure(
-                    item_path, ignore_patterns, always_ignore
-                )
-    
-    if not structure["files"]:
-        del structure["files"]
-    if not structure["directories"]:
-        del structure["directories"]
+        if max_depth is not None and depth > max_depth:
+            if files or dirs:
+                structure["more"] = _more_label(len(dirs), len(files), more=False)
+            continue
+        
+        hidden_dirs = hidden_files = 0
+        if max_entries is not None and len(dirs) + len(files) > max_entries:
+            shown_dirs = dirs[:max_entries]
+            shown_files = files[:max(max_entries - len(shown_dirs), 0)]
+            hidden_dirs, hidden_files = len(dirs) - len(shown_dirs), len(files) - len(shown_files)
+            dirs, files = shown_dirs, shown_files
+        
+        if files:
+            structure["files"] = files
+        if dirs:
+            structure["directories"] = {}
+            for item in dirs:
+                child: Dict = {}
+                structure["directories"][item] = child
+                stack.append((_join(rel_dir, item), child, depth + 1))
+        if hidden_dirs or hidden_files:
+            structure["more"] = _more_label(hidden_dirs, hidden_files)
     
-    return structure
+    return root
 
-def generate_tree_structure(startpath: str, ignore_patterns: List[str], always_ignore: List[str]) -> str:
-    lines = []
+def generate_tree_structure(snapshot: ProjectSnapshot, max_depth: Optional[int] = None,
+                            max_entries: Optional[int] = None) -> str:
+    lines = [os.path.basename(snapshot.root) + "/"]
     prefix_map = {"├── ": "│   ", "└── ": "    "}
     
-    def add_item(path: str, prefix: str = "") -> None:
-        items = sorted(os.listdir(path))
-        items = [item for item in items 
-                if not should_ignore(os.path.relpath(os.path.join(path, item), startpath), 
-                                   ignore_patterns + always_ignore)]
+    def entries(rel_dir: str) -> List[Tuple[str, Optional[str]]]:
+        """Sorted (name, rel_path) pairs for a directory; rel_path is None for plain lines."""
+        listing = snapshot.tree[rel_dir]
+        dir_names = set(listing.dirs)
+        items = sorted(listing.dirs + listing.files)
+        if max_entries is not None and len(items) > max_entries:
+            hidden = items[max_entries:]
+            hidden_dirs = sum(1 for item in hidden if item in dir_names)
+            items = items[:max_entries]
+            result = [(f"{item}/", _join(rel_dir, item)) if item in dir_names else (item, None)
+                      for item in items]
+            result.append((_more_label(hidden_dirs, len(hidden) - hidden_dirs), None))
+            return result
+        return [(f"{item}/", _join(rel_dir, item)) if item in dir_names else (item, None)
+                for item in items]
+    
+    # Stack of (entries, next index, prefix, depth) frames replaces recursion
+    stack = [(entries(""), 0, "", 1)]
+    while stack:
+        items, index, prefix, depth = stack.pop()
+        if index >= len(items):
+            continue
+        stack.append((items, index + 1, prefix, depth))
         
-        for i, item in enumerate(items):
-            item_path = os.path.join(path, item)
-            is_last = i == len(items) - 1
-            connector = "└── " if is_last else "├── "
-            
-            lines.append(f"{prefix}{connector}{item}")
-            
-            if os.path.isdir(item_path):
-                lines[-1] += "/"
-                next_prefix = prefix + prefix_map[connector]
-                add_item(item_path, next_prefix)
+        name, child_dir = items[index]
+        connector = "└── " if index == len(items) - 1 else "├── "
+        lines.append(f"{prefix}{connector}{name}")
+        
+        if child_dir is not None:
+            next_prefix = prefix + prefix_map[connector]
+            if max_depth is not None and depth >= max_depth:
+                listing = snapshot.tree[child_dir]
+                if listing.dirs or listing.files:
+                    lines.append(f"{next_prefix}└── {_more_label(len(listing.dirs), len(listing.files), more=False)}")
+            else:
+                stack.append((entries(child_dir), 0, next_prefix, depth + 1))
     
-    lines.append(os.path.basename(startpath) + "/")
-    add_item(startpath)
     return "\n".join(lines)
 
 def generate_directory_structure(startpath: str, 
-                               ignore_patterns: List[str], 
-                               always_ignore: List[str], 
-                               format: str = "tree") -> Union[Dict, str]:
-    if format == "json":
-        return generate_json_structure(startpath, ignore_patterns, always_ignore)
-    structure = generate_tree_structure(startpath, ignore_patterns, always_ignore)
+                               snapshot: Optional[ProjectSnapshot] = None, 
+                               format: str = "tree",
+                               max_depth: Optional[int] = None,
+                               max_entries: Optional[int] = None) -> Union[Dict, str]:
+    """Render the project structure.
+
+    ``max_depth`` stops descending below that many directory levels and
+    ``max_entries`` collapses larger directories to a "… N more files" line.
+    """
+    if snapshot is None:
+        with profiler.phase("scan"):
+            snapshot = ProjectSnapshot.scan(startpath)
+    with profiler.phase("structure"):
+        if format == "json":
+            return generate_json_structure(snapshot, max_depth, max_entries)
+        structure = generate_tree_structure(snapshot, max_depth, max_entries)
     return (
         '<project-structure description="This represents the structure of the directory. '
         'Use this tag to ensure proper referencing of files, functions, etc...">\n    '
         f'{structure}\n'
         '</project-structure>'
-    )
\ No newline at end of file
+    )
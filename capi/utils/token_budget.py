@@ -0,0 +1,203 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Rough BPE approximation: short letter runs, up to three digits, or single symbols
+_TOKEN_RE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+PRIORITY_RULES = ('selected', 'recent', 'small', 'large')
+DEFAULT_PRIORITY = ('selected', 'recent', 'small')
+# Below this many tokens a truncated file is not worth including
+MIN_TRUNCATE_TOKENS = 200
+# Source code averages about four bytes per token; used until a file has been read
+BYTES_PER_TOKEN = 4
+# Share of an agent's context_window at which the UI warns, unless it sets warn_tokens
+WARN_FRACTION = 0.8
+TRUNCATION_MARKER = "\n... [truncated by capi: {dropped} of {total} tokens omitted]"
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate; within ~15% of cl100k-style tokenizers on source code."""
+    if not text:
+        return 0
+    return len(_TOKEN_RE.findall(text)) + text.count('\n') // 4
+
+def tokens_for_size(size: int) -> int:
+    """Token estimate for a file that has not been read yet."""
+    return -(-size // BYTES_PER_TOKEN)
+
+def block_overhead(rel_path: str) -> int:
+    return estimate_tokens(f"\n```{rel_path}\n\n```")
+
+def truncate_to_tokens(text: str, tokens: int, total: Optional[int] = None) -> str:
+    total = estimate_tokens(text) if total is None else total
+    if total <= tokens:
+        return text
+    # Cut proportionally, then back off to the previous line break
+    cut = int(len(text) * tokens / total)
+    newline = text.rfind('\n', 0, cut)
+    if newline > cut // 2:
+        cut = newline
+    return text[:cut] + TRUNCATION_MARKER.format(dropped=total - tokens, total=total)
+
+def parse_priority(value: Optional[str]) -> Sequence[str]:
+    if not value:
+        return DEFAULT_PRIORITY
+    rules = tuple(r.strip() for r in value.split(',') if r.strip())
+    unknown = [r for r in rules if r not in PRIORITY_RULES]
+    if unknown:
+        raise ValueError(f"Unknown priority rule(s): {', '.join(unknown)}. "
+                         f"Choose from: {', '.join(PRIORITY_RULES)}")
+    return rules
+
+def _load_agents(agents_path: str) -> Dict[str, Dict]:
+    if not os.path.exists(agents_path):
+        return {}
+    with open(agents_path, 'r') as f:
+        return {agent['id']: agent for agent in json.load(f).get('agents', [])}
+
+def warning_thresholds(agents_path: str = 'prompting/cli/agents.json') -> Dict[str, int]:
+    """Token count per agent id at which a pack is getting too large for its model.
+
+    An agent's ``warn_tokens`` wins; otherwise it is ``WARN_FRACTION`` of its
+    ``context_window``. Agents with neither are left out.
+    """
+    thresholds = {}
+    for agent_id, agent in _load_agents(agents_path).items():
+        if agent.get('warn_tokens'):
+            thresholds[agent_id] = int(agent['warn_tokens'])
+        elif agent.get('context_window'):
+            thresholds[agent_id] = int(int(agent['context_window']) * WARN_FRACTION)
+    return thresholds
+
+def resolve_budget(value: Optional[str], agents_path: str = 'prompting/cli/agents.json') -> Optional[int]:
+    """Accept a token count or the id of an agent whose ``context_window`` is set in agents.json."""
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    agent = _load_agents(agents_path).get(value)
+    if agent and agent.get('context_window'):
+        return int(agent['context_window'])
+    raise ValueError(f"Budget must be a token count or an agent id with 'context_window' in {agents_path}")
+
+@dataclass
+class BudgetItem:
+    rel_path: str
+    tokens: int
+    mtime_ns: int = 0
+    selected: bool = False
+    fit_tokens: Optional[int] = None  # set when the file is truncated to fit
+
+    @property
+    def truncated(self) -> bool:
+        return self.fit_tokens is not None
+
+@dataclass
+class BudgetPlan:
+    budget: int
+    overhead: int
+    included: Dict[str, BudgetItem] = field(default_factory=dict)
+    dropped: List[BudgetItem] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.overhead + sum(
+            (item.fit_tokens if item.truncated else item.tokens) + block_overhead(item.rel_path)
+            for item in self.included.values()
+        )
+
+    @property
+    def paths(self) -> List[str]:
+        return sorted(self.included)
+
+    @property
+    def truncated_paths(self) -> List[str]:
+        return sorted(path for path, item in self.included.items() if item.truncated)
+
+    def fit(self, rel_path: str, content: str) -> str:
+        item = self.included.get(rel_path)
+        if item is None or not item.truncated:
+            return content
+        return truncate_to_tokens(content, item.fit_tokens, item.tokens)
+
+    def report(self) -> List[str]:
+        lines = [f"{'tokens':>9}  file"]
+        for path in self.paths:
+            item = self.included[path]
+            if item.truncated:
+                lines.append(f"{item.fit_tokens:>9}  {path} [truncated from {item.tokens}]")
+            else:
+                lines.append(f"{item.tokens:>9}  {path}")
+        if self.overhead:
+            lines.append(f"{self.overhead:>9}  (structure and context)")
+        for item in sorted(self.dropped, key=lambda i: i.rel_path):
+            lines.append(f"{item.tokens:>9}  {item.rel_path} [dropped]")
+        lines.append(f"Total: ~{self.total} of {self.budget} tokens "
+                     f"({len(self.included)} files, {len(self.dropped)} dropped)")
+        if self.overhead > self.budget:
+            lines.append("Warning: structure and context alone exceed the budget")
+        return lines
+
+class TokenBudget:
+    """Pick files, in priority order, until the estimated token budget is used up.
+
+    Rules are applied as a lexicographic sort key: ``selected`` puts explicit
+    selections first, ``recent`` prefers newer mtimes, ``small``/``large``
+    order by token count. The first file that no longer fits is truncated to
+    the remaining budget if that leaves a useful amount of it.
+    """
+
+    def __init__(self, budget: int, priority: Sequence[str] = DEFAULT_PRIORITY, overhead: int = 0):
+        self.budget = budget
+        self.priority = priority
+        self.overhead = overhead
+
+    def _rank_key(self, item: BudgetItem):
+        key = []
+        for rule in self.priority:
+            if rule == 'selected':
+                key.append(0 if item.selected else 1)
+            elif rule == 'recent':
+                key.append(-item.mtime_ns)
+            elif rule == 'small':
+                key.append(item.tokens)
+            elif rule == 'large':
+                key.append(-item.tokens)
+        key.append(item.rel_path)
+        return key
+
+    def plan(self, items: Iterable[BudgetItem]) -> BudgetPlan:
+        plan = BudgetPlan(budget=self.budget, overhead=self.overhead)
+        remaining = self.budget - self.overhead
+        for item in sorted(items, key=self._rank_key):
+            cost = item.tokens + block_overhead(item.rel_path)
+            if cost <= remaining:
+                plan.included[item.rel_path] = item
+                remaining -= cost
+            elif remaining - block_overhead(item.rel_path) >= MIN_TRUNCATE_TOKENS:
+                item.fit_tokens = remaining - block_overhead(item.rel_path) - estimate_tokens(
+                    TRUNCATION_MARKER.format(dropped=item.tokens, total=item.tokens))
+                plan.included[item.rel_path] = item
+                remaining = 0
+            else:
+                plan.dropped.append(item)
+        return plan
+
+def plan_files(read_results, meta: Dict, budget: TokenBudget,
+               selected: Iterable[str] = ()) -> BudgetPlan:
+    """Estimate tokens for every readable file and plan which of them fit the budget."""
+    selected = set(selected)
+    items = []
+    for rel_path, content in read_results:
+        if content is None:
+            continue
+        info = meta.get(rel_path)
+        items.append(BudgetItem(
+            rel_path=rel_path,
+            tokens=estimate_tokens(content),
+            mtime_ns=info.mtime_ns if info else 0,
+            selected=rel_path in selected
+        ))
+    return budget.plan(items)